@@ -0,0 +1,47 @@
+"""Compare the trigger automaton with scanning every trigger per message
+
+Usage: python -m benchmarks.bench_autoresponse [trigger counts...]
+"""
+import random
+import string
+import sys
+import time
+from utils.matching import TriggerMatcher
+
+def random_word(rng, low=3, high=10):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+def timed(func, messages):
+    """Average seconds per message"""
+    start = time.perf_counter()
+    for message in messages:
+        func(message)
+    return (time.perf_counter() - start) / len(messages)
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000, 10_000]
+    rng = random.Random(0)
+    messages = [' '.join(random_word(rng) for _ in range(rng.randint(3, 30))) for _ in range(2000)]
+
+    for count in counts:
+        triggers = list(dict.fromkeys(random_word(rng, 4, 12) for _ in range(count)))
+
+        def scan(message):
+            for trigger in triggers:
+                if trigger in message:
+                    return trigger
+            return None
+
+        start = time.perf_counter()
+        matcher = TriggerMatcher(triggers)
+        build = time.perf_counter() - start
+
+        assert all(scan(message) == matcher.search(message) for message in messages)
+        hits = sum(matcher.search(message) is not None for message in messages)
+
+        print(f"{len(triggers):,} triggers, automaton built in {build * 1e3:.1f} ms, {hits} of {len(messages)} messages match")
+        print(f"  linear scan: {timed(scan, messages) * 1e6:10.1f} us/message")
+        print(f"  automaton:   {timed(matcher.search, messages) * 1e6:10.1f} us/message")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Replay a message stream through EmojiManager.on_message
+
+Compares the listener with the previous behaviour of recompiling the
+pattern and rewriting emojis.json on every message with a custom emoji.
+
+Usage: python -m benchmarks.bench_emoji_listener [messages] [tracked emojis]
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from cogs.emojis import EmojiManager
+
+GUILD_ID = 1
+
+def make_messages(count, emoji_ids, rng):
+    """Chat messages where about a third use a custom emoji"""
+    messages = []
+    for _ in range(count):
+        words = ['word'] * rng.randint(3, 20)
+        if rng.random() < 0.3:
+            emoji_id = rng.choice(emoji_ids)
+            words.insert(rng.randrange(len(words)), f"<:emoji{emoji_id}:{emoji_id}>")
+        messages.append(SimpleNamespace(
+            author=SimpleNamespace(bot=False),
+            guild=SimpleNamespace(id=GUILD_ID),
+            content=' '.join(words)
+        ))
+    return messages
+
+def previous_listener(cog, message):
+    """The listener as it was before usage counts were batched"""
+    guild_id = str(message.guild.id)
+    if guild_id not in cog.emoji_data:
+        return
+    emoji_pattern = re.compile(r'<a?:(\w+):(\d+)>')
+    matches = emoji_pattern.findall(message.content)
+    for name, emoji_id in matches:
+        if emoji_id in cog.emoji_data[guild_id]:
+            cog.emoji_data[guild_id][emoji_id]['uses'] += 1
+    if matches:
+        with open(cog.emoji_data_file, 'w') as f:
+            json.dump(cog.emoji_data, f, indent=2)
+
+def make_cog(path, emoji_ids):
+    cog = EmojiManager(SimpleNamespace())
+    cog.emoji_data_file = path
+    cog.emoji_data = {str(GUILD_ID): {
+        str(emoji_id): {'name': f"emoji{emoji_id}", 'creator': 0, 'created_at': '', 'animated': False, 'uses': 0}
+        for emoji_id in emoji_ids
+    }}
+    return cog
+
+def uses(cog):
+    """Use counts per emoji"""
+    return {
+        (guild_id, emoji_id): data['uses']
+        for guild_id, emojis in cog.emoji_data.items()
+        for emoji_id, data in emojis.items()
+    }
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    tracked = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    rng = random.Random(0)
+    emoji_ids = [900000000000000000 + i for i in range(tracked)]
+    messages = make_messages(count, emoji_ids, rng)
+
+    with tempfile.TemporaryDirectory() as directory:
+        old = make_cog(os.path.join(directory, 'old.json'), emoji_ids)
+        start = time.perf_counter()
+        for message in messages:
+            previous_listener(old, message)
+        old_time = time.perf_counter() - start
+
+        new = make_cog(os.path.join(directory, 'new.json'), emoji_ids)
+        start = time.perf_counter()
+        for message in messages:
+            await new.on_message(message)
+        new.usage.flush()
+        new_time = time.perf_counter() - start
+        await new.write_emoji_data()
+
+        # The new listener also keeps hourly rollups, so compare the counts only
+        assert uses(old) == uses(new)
+
+    print(f"{count:,} messages, {tracked} tracked emojis")
+    print(f"  rewrite per message: {old_time * 1e6 / count:8.1f} us/message ({old_time:.2f}s)")
+    print(f"  batched counters:    {new_time * 1e6 / count:8.1f} us/message ({new_time:.2f}s)")
+
+if __name__ == '__main__':
+    asyncio.run(main())
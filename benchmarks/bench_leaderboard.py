@@ -0,0 +1,50 @@
+"""Compare the balance index with sorting every user per leaderboard page
+
+Usage: python -m benchmarks.bench_leaderboard [count]
+"""
+import random
+import sys
+import time
+from utils.indexes import BalanceIndex
+
+def timed(func, repeat):
+    """Average seconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(0)
+    balances = {str(100000000000000000 + i): rng.randint(0, 1_000_000) for i in range(count)}
+    user_ids = list(balances)
+
+    start = time.perf_counter()
+    index = BalanceIndex(balances.items())
+    build = time.perf_counter() - start
+
+    def sort_page():
+        ranked = sorted(balances.items(), key=lambda x: x[1], reverse=True)
+        return ranked[5000:5010]
+
+    def index_page():
+        return index.page(rng.randrange(count - 10), 10)
+
+    def index_rank():
+        return index.rank(rng.choice(user_ids))
+
+    def index_update():
+        user_id = rng.choice(user_ids)
+        index.update(user_id, rng.randint(0, 1_000_000))
+
+    assert [b for _, b in sort_page()] == [b for _, b in index.page(5000, 10)]
+
+    print(f"{count:,} users, index built in {build:.2f}s")
+    print(f"  sorted() per page: {timed(sort_page, 3) * 1e3:10.2f} ms")
+    print(f"  index page:        {timed(index_page, 10000) * 1e6:10.2f} us")
+    print(f"  index rank:        {timed(index_rank, 10000) * 1e6:10.2f} us")
+    print(f"  index update:      {timed(index_update, 10000) * 1e6:10.2f} us")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Fire thousands of concurrent pay and gamble commands at a few users
+
+Runs the Economy cog's commands against a throwaway database with every
+ctx.send yielding to the event loop, then checks that money was
+conserved, no balance went negative and the ledger agrees with every
+stored balance. For comparison the same check-then-debit is also run
+without the user locks, yielding between the check and the debit.
+
+Usage: python -m benchmarks.bench_pay_stress [commands] [users]
+"""
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from config.settings import ECONOMY_CONFIG, STORAGE_CONFIG
+
+GUILD = SimpleNamespace(name='bench', id=1)
+
+def make_member(user_id):
+    async def send(**kwargs):
+        await asyncio.sleep(0)
+    return SimpleNamespace(id=user_id, bot=False, mention=f"<@{user_id}>", send=send)
+
+def make_ctx(author):
+    async def send(**kwargs):
+        await asyncio.sleep(0)
+    return SimpleNamespace(author=author, guild=GUILD, send=send)
+
+def user_total(db, user_ids):
+    return sum(db.view_user(user_id)['balance'] for user_id in user_ids)
+
+async def unlocked_pay(db, src, dst, amount):
+    """Check-then-debit with an await in between, as commands did before the locks"""
+    if db.view_user(src)['balance'] < amount:
+        return
+    await asyncio.sleep(0)
+    user = db.get_user(src)
+    user['balance'] -= amount
+    db.get_user(dst)['balance'] += amount
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        STORAGE_CONFIG['ledger_path'] = os.path.join(directory, 'ledger.db')
+        STORAGE_CONFIG['journal_path'] = os.path.join(directory, 'journal.log')
+        from cogs.economy import Economy
+        from utils.database import Database
+        from utils.storage import SQLiteBackend
+
+        db = Database(backend=SQLiteBackend(os.path.join(directory, 'bot.db')))
+        cog = Economy(SimpleNamespace(db=db))
+        members = [make_member(1000 + i) for i in range(users)]
+        user_ids = [member.id for member in members]
+        for user_id in user_ids:
+            db.get_user(user_id)
+        starting_total = user_total(db, user_ids)
+
+        commands = []
+        for _ in range(count):
+            author, target = rng.sample(members, 2)
+            amount = rng.randint(1, ECONOMY_CONFIG['starting_balance'] // 2)
+            if rng.random() < 0.8:
+                commands.append(Economy.pay.callback(cog, make_ctx(author), target, amount))
+            else:
+                commands.append(Economy.gamble.callback(cog, make_ctx(author), amount))
+
+        start = time.perf_counter()
+        await asyncio.gather(*commands)
+        elapsed = time.perf_counter() - start
+
+        balances = [db.view_user(user_id)['balance'] for user_id in user_ids]
+        house = db.ledger.balance('house')
+        mismatches = await db.verify_ledger()
+        conserved = sum(balances) + house == starting_total
+        print(f"{count:,} concurrent pay/gamble commands between {users} users in {elapsed:.2f}s")
+        print(f"  money conserved (users + house): {conserved}")
+        print(f"  lowest balance:                  {min(balances):,}")
+        print(f"  ledger mismatches:               {len(mismatches)}")
+        assert conserved and min(balances) >= 0 and not mismatches
+
+        # The same workload without the locks, for comparison
+        for user_id in user_ids:
+            db.get_user(user_id)['balance'] = ECONOMY_CONFIG['starting_balance']
+        await asyncio.gather(*(
+            unlocked_pay(db, *rng.sample(user_ids, 2), rng.randint(1, ECONOMY_CONFIG['starting_balance'] // 2))
+            for _ in range(count)
+        ))
+        print(f"  without locks, lowest balance:   {min(db.view_user(user_id)['balance'] for user_id in user_ids):,}")
+
+        db.close()
+
+if __name__ == '__main__':
+    asyncio.run(main())
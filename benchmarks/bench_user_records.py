@@ -0,0 +1,52 @@
+"""Compare memory used by dict-based and slot-based user records
+
+Usage: python -m benchmarks.bench_user_records [count ...]
+"""
+import gc
+import sys
+import tracemalloc
+from datetime import datetime
+from utils.records import UserRecord
+
+def make_dict_user():
+    """User layout used before UserRecord"""
+    return {
+        'balance': 1000,
+        'last_daily': 0,
+        'last_work': 0,
+        'warnings': [],
+        'total_earned': 0,
+        'total_spent': 0,
+        'inventory': {},
+        'active_perks': {},
+        'created_at': datetime.utcnow().isoformat()
+    }
+
+def make_record_user():
+    return UserRecord(balance=1000)
+
+def measure(factory, count):
+    """Return bytes allocated to hold count users keyed by ID"""
+    gc.collect()
+    tracemalloc.start()
+    users = {str(100000000000000000 + i): factory() for i in range(count)}
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del users
+    return current
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    for count in counts:
+        dict_bytes = measure(make_dict_user, count)
+        record_bytes = measure(make_record_user, count)
+        print(
+            f"{count:>9,} users: dict {dict_bytes / 2**20:7.1f} MiB "
+            f"({dict_bytes // count} B/user), "
+            f"UserRecord {record_bytes / 2**20:7.1f} MiB "
+            f"({record_bytes // count} B/user), "
+            f"{dict_bytes / record_bytes:.1f}x smaller"
+        )
+
+if __name__ == '__main__':
+    main()
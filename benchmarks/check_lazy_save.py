@@ -0,0 +1,76 @@
+"""Check that lazy user saves never lose or delete an evicted user
+
+Runs a throwaway lazy-mode database with a tiny user cache through an
+eviction during a save that fails, then a save that succeeds, and checks
+the evicted user's latest balance reached the backend. Also checks a
+reset user is deleted only by the save that follows the reset.
+
+Usage: python -m benchmarks.check_lazy_save
+"""
+import asyncio
+import os
+import tempfile
+from config.settings import STORAGE_CONFIG
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        STORAGE_CONFIG['lazy_users'] = True
+        STORAGE_CONFIG['user_cache_size'] = 2
+        STORAGE_CONFIG['ledger_path'] = os.path.join(directory, 'ledger.db')
+        STORAGE_CONFIG['journal_path'] = os.path.join(directory, 'journal.log')
+        from utils.database import Database
+        from utils.storage import SQLiteBackend
+
+        backend = SQLiteBackend(os.path.join(directory, 'bot.db'))
+        db = Database(backend=backend)
+        failures = 0
+
+        def check(name, passed):
+            nonlocal failures
+            failures += not passed
+            print(f"  {'ok  ' if passed else 'FAIL'} {name}")
+
+        # evict -> failed save -> next save
+        db.get_user('1')
+        db.save_all()
+        db.update_user('1', {'balance': 4321})
+
+        save_async = backend.save_async
+        started = asyncio.Event()
+
+        async def failing_save(*args):
+            started.set()
+            await asyncio.sleep(0.05)
+            raise OSError("disk full")
+
+        backend.save_async = failing_save
+        save = asyncio.create_task(db.save_all_async())
+        await started.wait()
+        db.get_user('2')
+        db.get_user('3')
+        check("user evicted during the save", db.users_data.peek('1') is None)
+        try:
+            await save
+        except OSError:
+            pass
+        backend.save_async = save_async
+
+        await db.save_all_async()
+        stored = backend.get('users', '1')
+        check("evicted user survives the failed save", stored is not None)
+        check("evicted user keeps its latest balance", stored is not None and stored['balance'] == 4321)
+
+        # A reset is only written by the next save, and only for that user
+        db.reset_user('2')
+        check("reset user hidden before the save", db.users_data.get('2') is None)
+        check("reset user still stored before the save", backend.get('users', '2') is not None)
+        db.save_all()
+        check("reset user deleted by the save", backend.get('users', '2') is None)
+        check("other users untouched", backend.get('users', '1') is not None)
+
+        db.close()
+
+    assert not failures, f"{failures} checks failed"
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""Check WebClient.fetch against a local stub HTTP server
+
+Covers a normal download, a Content-Length over the cap, a chunked body
+that passes the cap while streaming, a server that stalls mid-body and
+a 404, and reports how long each took to fail.
+
+Usage: python -m benchmarks.check_web_client
+"""
+import asyncio
+import time
+from aiohttp import web
+from config.settings import HTTP_CONFIG
+from utils.web import DownloadError, DownloadTooLarge, WebClient
+
+MAX_SIZE = 256_000
+
+async def ok(request):
+    return web.Response(body=b'x' * 1000)
+
+async def big_length(request):
+    return web.Response(body=b'x' * (MAX_SIZE + 1))
+
+async def chunked(request):
+    response = web.StreamResponse()
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    for _ in range(100):
+        await response.write(b'x' * 16384)
+    await response.write_eof()
+    return response
+
+async def stalled(request):
+    response = web.StreamResponse()
+    response.content_length = 10_000
+    await response.prepare(request)
+    await response.write(b'x' * 100)
+    # Hold the connection open until the check is done
+    await request.app['release'].wait()
+    return response
+
+async def main():
+    HTTP_CONFIG['read_timeout'] = 1
+
+    app = web.Application()
+    app['release'] = asyncio.Event()
+    app.router.add_get('/ok', ok)
+    app.router.add_get('/big-length', big_length)
+    app.router.add_get('/chunked', chunked)
+    app.router.add_get('/stalled', stalled)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    cases = [
+        ('ok', None),
+        ('big-length', DownloadTooLarge),
+        ('chunked', DownloadTooLarge),
+        ('stalled', DownloadError),
+        ('missing', DownloadError)
+    ]
+    client = WebClient()
+    failures = 0
+    try:
+        for path, expected in cases:
+            start = time.perf_counter()
+            try:
+                data = await client.fetch(f"http://127.0.0.1:{port}/{path}", MAX_SIZE)
+                outcome = f"{len(data)} bytes"
+                passed = expected is None
+            except DownloadError as e:
+                outcome = f"{type(e).__name__}: {e}"
+                passed = expected is not None and isinstance(e, expected)
+            elapsed = time.perf_counter() - start
+            failures += not passed
+            print(f"  {'ok  ' if passed else 'FAIL'} /{path:<11} {elapsed * 1000:7.1f} ms  {outcome}")
+    finally:
+        app['release'].set()
+        await client.close()
+        await runner.cleanup()
+
+    assert not failures, f"{failures} cases failed"
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -2,7 +2,10 @@ import discord
 from discord.ext import commands
 import asyncio
 from datetime import datetime, timedelta
+from typing import Literal, Optional
 from utils.helpers import create_embed, create_success_embed, create_error_embed, is_staff
+from utils.matching import check_regex
+from utils.ratelimit import RateLimiter
 from config.settings import AUTORESPONSE_CONFIG
 
 class AutoResponse(commands.Cog):
@@ -10,7 +13,10 @@ class AutoResponse(commands.Cog):
     
     def __init__(self, bot):
         self.bot = bot
-        self.response_cooldowns = {}  # Track response cooldowns per user
+        # Response limits per user (in each guild), per channel and per guild
+        self.user_limits = RateLimiter(1, AUTORESPONSE_CONFIG['cooldown'])
+        self.channel_limits = RateLimiter(AUTORESPONSE_CONFIG['max_responses_per_minute'], 60)
+        self.guild_limits = RateLimiter(AUTORESPONSE_CONFIG['max_guild_responses_per_minute'], 60)
     
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -23,20 +29,21 @@ class AutoResponse(commands.Cog):
         if not AUTORESPONSE_CONFIG['enabled']:
             return
         
-        # Check cooldown
-        now = datetime.utcnow().timestamp()
-        user_id = message.author.id
-        
-        if user_id in self.response_cooldowns:
-            if now - self.response_cooldowns[user_id] < AUTORESPONSE_CONFIG['cooldown']:
-                return
+        # Check cooldowns before matching, but only use them up when responding
+        user_key = (message.guild.id, message.author.id)
+        if (self.user_limits.retry_after(user_key) or
+                self.channel_limits.retry_after(message.channel.id) or
+                self.guild_limits.retry_after(message.guild.id)):
+            return
         
         # Get auto response
         response = self.bot.db.get_autoresponse(message.guild.id, message.content)
         
         if response:
-            # Update cooldown
-            self.response_cooldowns[user_id] = now
+            # Update cooldowns
+            self.user_limits.hit(user_key)
+            self.channel_limits.hit(message.channel.id)
+            self.guild_limits.hit(message.guild.id)
             
             # Send response
             try:
@@ -53,7 +60,8 @@ class AutoResponse(commands.Cog):
         """Auto response management commands"""
         embed = create_embed(
             "🤖 Auto Response Commands",
-            f"`{ctx.prefix}ar add <trigger> <response>` - Add auto response\n"
+            f"`{ctx.prefix}ar add [mode] <trigger> <response>` - Add auto response\n"
+            f"Modes: `contains` (default), `word`, `startswith`, `exact`, `regex`\n"
             f"`{ctx.prefix}ar remove <trigger>` - Remove auto response\n"
             f"`{ctx.prefix}ar list` - List all auto responses\n"
             f"`{ctx.prefix}ar toggle` - Toggle auto responses on/off"
@@ -62,8 +70,9 @@ class AutoResponse(commands.Cog):
     
     @autoresponse_group.command(name='add')
     @is_staff()
-    async def add_autoresponse(self, ctx, trigger, *, response):
+    async def add_autoresponse(self, ctx, mode: Optional[Literal['contains', 'word', 'startswith', 'exact', 'regex']], trigger, *, response):
         """Add an auto response"""
+        mode = mode or 'contains'
         if len(trigger) < 2:
             embed = create_error_embed("❌ Invalid Trigger", "Trigger must be at least 2 characters long.")
             await ctx.send(embed=embed)
@@ -74,12 +83,23 @@ class AutoResponse(commands.Cog):
             await ctx.send(embed=embed)
             return
         
+        if mode == 'regex':
+            error = await check_regex(
+                trigger,
+                AUTORESPONSE_CONFIG['regex_time_budget_ms'] / 1000,
+                AUTORESPONSE_CONFIG['regex_max_input']
+            )
+            if error:
+                embed = create_error_embed("❌ Invalid Pattern", error)
+                await ctx.send(embed=embed)
+                return
+        
         # Add to database
-        self.bot.db.add_autoresponse(ctx.guild.id, trigger, response)
+        self.bot.db.add_autoresponse(ctx.guild.id, trigger, response, mode)
         
         embed = create_success_embed(
             "✅ Auto Response Added",
-            f"**Trigger:** {trigger}\n**Response:** {response[:100]}{'...' if len(response) > 100 else ''}"
+            f"**Trigger:** {trigger} ({mode})\n**Response:** {response[:100]}{'...' if len(response) > 100 else ''}"
         )
         await ctx.send(embed=embed)
     
@@ -132,13 +152,14 @@ class AutoResponse(commands.Cog):
         for trigger, data in items:
             response = data['response']
             uses = data['uses']
+            mode = data.get('mode', 'contains')
             
             # Truncate long responses
             if len(response) > 200:
                 response = response[:200] + "..."
             
             embed.add_field(
-                name=f"📝 {trigger} (Used {uses} times)",
+                name=f"📝 {data.get('pattern', trigger)} [{mode}] (Used {uses} times)",
                 value=response,
                 inline=False
             )
@@ -183,8 +204,14 @@ class AutoResponse(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        # Update the response
-        self.bot.db.add_autoresponse(ctx.guild.id, trigger, new_response)
+        # Update the response, keeping how the trigger matches
+        data = autoresponses[trigger.lower()]
+        self.bot.db.add_autoresponse(
+            ctx.guild.id,
+            data.get('pattern', trigger),
+            new_response,
+            data.get('mode', 'contains')
+        )
         
         embed = create_success_embed(
             "✅ Auto Response Updated",
@@ -212,6 +239,7 @@ class AutoResponse(commands.Cog):
         embed = create_embed(
             f"📝 Auto Response: {trigger}",
             f"**Response:**\n{data['response']}\n\n"
+            f"**Match Mode:** {data.get('mode', 'contains')}{' (disabled: too slow)' if data.get('disabled') else ''}\n"
             f"**Uses:** {data['uses']}\n"
             f"**Created:** {created_at.strftime('%Y-%m-%d %H:%M:%S')} UTC"
         )
@@ -276,7 +304,7 @@ class AutoResponse(commands.Cog):
             
             if str(reaction.emoji) == "✅":
                 # Clear all responses
-                self.bot.db.autoresponse_data[str(ctx.guild.id)] = {}
+                self.bot.db.clear_autoresponses(ctx.guild.id)
                 
                 embed = create_success_embed(
                     "✅ Responses Cleared",
@@ -3,7 +3,9 @@ from discord.ext import commands
 import random
 import asyncio
 from datetime import datetime, timedelta
-from utils.helpers import create_embed, create_success_embed, create_error_embed, format_time
+from utils.helpers import create_embed, create_success_embed, create_error_embed, format_time, get_user_mention
+from utils.ledger import ADMIN_ACCOUNT, HOUSE_ACCOUNT, SHOP_ACCOUNT
+from utils.ratelimit import cooldown
 from config.settings import ECONOMY_CONFIG
 
 class Economy(commands.Cog):
@@ -16,7 +18,7 @@ class Economy(commands.Cog):
     async def balance(self, ctx, user: discord.Member = None):
         """Check your or another user's balance"""
         target = user if user is not None else ctx.author
-        user_data = self.bot.db.get_user(target.id)
+        user_data = self.bot.db.view_user(target.id)
         
         embed = create_embed(
             f"💰 {target.display_name}'s Balance",
@@ -29,11 +31,11 @@ class Economy(commands.Cog):
         await ctx.send(embed=embed)
     
     @commands.command(name='daily')
-    @commands.cooldown(1, 5, commands.BucketType.user)
+    @cooldown(1, 5, commands.BucketType.user)
     async def daily(self, ctx):
         """Claim your daily reward"""
         if not self.bot.db.can_daily(ctx.author.id):
-            user_data = self.bot.db.get_user(ctx.author.id)
+            user_data = self.bot.db.view_user(ctx.author.id)
             next_daily = user_data['last_daily'] + ECONOMY_CONFIG['daily_cooldown']
             remaining = next_daily - datetime.utcnow().timestamp()
             
@@ -58,7 +60,7 @@ class Economy(commands.Cog):
         
         # Add bonus if applicable
         if bonus_amount > 0:
-            self.bot.db.add_balance(ctx.author.id, bonus_amount)
+            self.bot.db.add_balance(ctx.author.id, bonus_amount, 'daily_bonus')
             
         description = f"You received **${total_amount:,}**!"
         if bonus_amount > 0:
@@ -69,11 +71,11 @@ class Economy(commands.Cog):
         await ctx.send(embed=embed)
     
     @commands.command(name='work')
-    @commands.cooldown(1, 5, commands.BucketType.user)
+    @cooldown(1, 5, commands.BucketType.user)
     async def work(self, ctx):
         """Work to earn money"""
         if not self.bot.db.can_work(ctx.author.id):
-            user_data = self.bot.db.get_user(ctx.author.id)
+            user_data = self.bot.db.view_user(ctx.author.id)
             next_work = user_data['last_work'] + ECONOMY_CONFIG['work_cooldown']
             remaining = next_work - datetime.utcnow().timestamp()
             
@@ -136,15 +138,12 @@ class Economy(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        # Check if user has enough money
-        if not self.bot.db.remove_balance(ctx.author.id, amount):
+        # Move the money, failing if the sender can't cover it
+        if not await self.bot.db.transfer_locked(ctx.author.id, user.id, amount, 'pay'):
             embed = create_error_embed("❌ Insufficient Funds", "You don't have enough money.")
             await ctx.send(embed=embed)
             return
         
-        # Add money to recipient
-        self.bot.db.add_balance(user.id, amount)
-        
         embed = create_success_embed(
             "💸 Payment Sent",
             f"You paid **${amount:,}** to {user.mention}!"
@@ -161,40 +160,16 @@ class Economy(commands.Cog):
         except discord.Forbidden:
             pass
     
-    @commands.command(name='leaderboard', aliases=['lb', 'top'])
-    async def leaderboard(self, ctx, page: int = 1):
-        """View the money leaderboard"""
-        users_data = self.bot.db.users_data
-        
-        # Sort by balance
-        sorted_users = sorted(
-            users_data.items(),
-            key=lambda x: x[1]['balance'],
-            reverse=True
-        )
-        
-        # Pagination
-        per_page = 10
-        total_pages = max(1, (len(sorted_users) + per_page - 1) // per_page)
-        page = max(1, min(page, total_pages))
-        
-        start = (page - 1) * per_page
-        end = start + per_page
-        
+    def build_leaderboard_embed(self, title, entries, start, page, total_pages, rank, get_name):
+        """Build a leaderboard page embed from ranked (user_id, balance) pairs"""
         embed = create_embed(
-            f"💰 Money Leaderboard - Page {page}/{total_pages}",
+            f"{title} - Page {page}/{total_pages}",
             ""
         )
         
         leaderboard_text = ""
-        for i, (user_id, data) in enumerate(sorted_users[start:end], start + 1):
-            user = self.bot.get_user(int(user_id))
-            if user:
-                name = user.display_name
-            else:
-                name = f"Unknown User ({user_id})"
-            
-            balance = data['balance']
+        for i, (user_id, balance) in enumerate(entries, start + 1):
+            name = get_name(int(user_id)) or f"Unknown User ({user_id})"
             
             # Add medal for top 3
             if i == 1:
@@ -209,52 +184,160 @@ class Economy(commands.Cog):
             leaderboard_text += f"{medal} **{name}** - ${balance:,}\n"
         
         embed.description = leaderboard_text or "No users found."
-        embed.set_footer(text=f"Page {page}/{total_pages}")
         
+        footer = f"Page {page}/{total_pages}"
+        if rank:
+            footer += f" • Your rank: #{rank:,}"
+        embed.set_footer(text=footer)
+        
+        return embed
+    
+    @commands.command(name='leaderboard', aliases=['lb', 'top'])
+    async def leaderboard(self, ctx, page: int = 1):
+        """View the money leaderboard"""
+        # Pagination
+        per_page = 10
+        total_users = self.bot.db.get_ranked_count()
+        total_pages = max(1, (total_users + per_page - 1) // per_page)
+        page = max(1, min(page, total_pages))
+        
+        start = (page - 1) * per_page
+        
+        def get_name(user_id):
+            user = self.bot.get_user(user_id)
+            return user.display_name if user else None
+        
+        embed = self.build_leaderboard_embed(
+            "💰 Money Leaderboard",
+            self.bot.db.get_leaderboard(start, per_page),
+            start, page, total_pages,
+            self.bot.db.get_rank(ctx.author.id),
+            get_name
+        )
         await ctx.send(embed=embed)
     
-    @commands.command(name='gamble', aliases=['bet'])
-    @commands.cooldown(1, 10, commands.BucketType.user)
-    async def gamble(self, ctx, amount: int):
-        """Gamble your money (50/50 chance)"""
-        if amount <= 0:
-            embed = create_error_embed("❌ Invalid Amount", "Amount must be positive.")
-            await ctx.send(embed=embed)
-            return
+    @commands.command(name='serverleaderboard', aliases=['slb', 'servertop'])
+    @commands.guild_only()
+    async def server_leaderboard(self, ctx, page: int = 1):
+        """View the money leaderboard for this server's members"""
+        # Pagination
+        per_page = 10
+        total_users = self.bot.db.get_guild_ranked_count(ctx.guild.id)
+        total_pages = max(1, (total_users + per_page - 1) // per_page)
+        page = max(1, min(page, total_pages))
         
-        user_data = self.bot.db.get_user(ctx.author.id)
-        if user_data['balance'] < amount:
-            embed = create_error_embed("❌ Insufficient Funds", "You don't have enough money.")
-            await ctx.send(embed=embed)
-            return
+        start = (page - 1) * per_page
         
-        # Maximum bet
-        max_bet = min(user_data['balance'], 10000)
-        if amount > max_bet:
-            embed = create_error_embed(
-                "❌ Bet Too High",
-                f"Maximum bet is **${max_bet:,}**."
+        def get_name(user_id):
+            member = ctx.guild.get_member(user_id)
+            return member.display_name if member else None
+        
+        embed = self.build_leaderboard_embed(
+            f"💰 {ctx.guild.name} Leaderboard",
+            self.bot.db.get_guild_leaderboard(ctx.guild.id, start, per_page),
+            start, page, total_pages,
+            self.bot.db.get_guild_rank(ctx.guild.id, ctx.author.id),
+            get_name
+        )
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='rank')
+    async def rank(self, ctx, user: discord.Member = None):
+        """View your or another user's leaderboard rank"""
+        target = user if user is not None else ctx.author
+        rank = self.bot.db.get_rank(target.id)
+        
+        if rank is None:
+            embed = create_embed(
+                f"🏅 {target.display_name}'s Rank",
+                f"{target.display_name} isn't on the leaderboard yet."
+            )
+        else:
+            balance = self.bot.db.view_user(target.id)['balance']
+            embed = create_embed(
+                f"🏅 {target.display_name}'s Rank",
+                f"**Rank:** #{rank:,} of {self.bot.db.get_ranked_count():,}\n"
+                f"**Balance:** ${balance:,}"
+            )
+        embed.set_thumbnail(url=target.display_avatar.url)
+        
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='transactions', aliases=['txs', 'history'])
+    async def transactions(self, ctx, before: int = None):
+        """View your transaction history, optionally older than a transaction ID"""
+        per_page = 10
+        entries = self.bot.db.get_transactions(ctx.author.id, before=before, limit=per_page)
+        
+        if not entries:
+            embed = create_embed(
+                "📜 Transaction History",
+                "No transactions found."
             )
             await ctx.send(embed=embed)
             return
         
-        # Remove the bet amount
-        self.bot.db.remove_balance(ctx.author.id, amount)
+        account = str(ctx.author.id)
+        lines = []
+        for entry in entries:
+            incoming = entry['dst'] == account
+            other = entry['src'] if incoming else entry['dst']
+            counterparty = get_user_mention(other) if other.isdigit() else other
+            sign = "+" if incoming else "-"
+            lines.append(
+                f"`#{entry['id']}` <t:{int(entry['ts'])}:R> **{sign}${entry['amount']:,}** "
+                f"{entry['type'].replace('_', ' ')} ({'from' if incoming else 'to'} {counterparty})"
+            )
         
-        # Check for gamble luck perk (increases win chance)
-        win_chance = 0.5  # 50% base chance
-        if self.bot.db.is_perk_active(ctx.author.id, 'gamble_luck'):
-            win_chance = 0.65  # 65% chance with luck perk
+        embed = create_embed("📜 Transaction History", "\n".join(lines))
+        if len(entries) == per_page:
+            embed.set_footer(text=f"Older transactions: {ctx.prefix}transactions {entries[-1]['id']}")
         
-        won = random.random() < win_chance
+        await ctx.send(embed=embed)
+    
+    @commands.command(name='gamble', aliases=['bet'])
+    @cooldown(1, 10, commands.BucketType.user)
+    async def gamble(self, ctx, amount: int):
+        """Gamble your money (50/50 chance)"""
+        if amount <= 0:
+            embed = create_error_embed("❌ Invalid Amount", "Amount must be positive.")
+            await ctx.send(embed=embed)
+            return
         
-        luck_active = self.bot.db.is_perk_active(ctx.author.id, 'gamble_luck')
+        # Errors are sent after the lock is released
+        error = None
+        async with self.bot.db.transaction(ctx.author.id):
+            user_data = self.bot.db.view_user(ctx.author.id)
+            
+            # Maximum bet
+            max_bet = min(user_data['balance'], 10000)
+            if user_data['balance'] < amount:
+                error = create_error_embed("❌ Insufficient Funds", "You don't have enough money.")
+            elif amount > max_bet:
+                error = create_error_embed(
+                    "❌ Bet Too High",
+                    f"Maximum bet is **${max_bet:,}**."
+                )
+            else:
+                # Remove the bet amount
+                self.bot.db.remove_balance(ctx.author.id, amount, 'gamble_bet', HOUSE_ACCOUNT)
+                
+                # Check for gamble luck perk (increases win chance)
+                luck_active = self.bot.db.is_perk_active(ctx.author.id, 'gamble_luck')
+                win_chance = 0.65 if luck_active else 0.5  # 65% chance with luck perk
+                
+                won = random.random() < win_chance
+                
+                # Win double the amount
+                winnings = amount * 2
+                if won:
+                    self.bot.db.add_balance(ctx.author.id, winnings, 'gamble_win', HOUSE_ACCOUNT)
+        
+        if error:
+            await ctx.send(embed=error)
+            return
         
         if won:
-            # Win double the amount
-            winnings = amount * 2
-            self.bot.db.add_balance(ctx.author.id, winnings)
-            
             description = f"You bet **${amount:,}** and won **${winnings:,}**!\n"
             description += f"Net profit: **${amount:,}**"
             if luck_active:
@@ -340,7 +423,7 @@ class Economy(commands.Cog):
                 inline=False
             )
             
-            user_data = self.bot.db.get_user(ctx.author.id)
+            user_data = self.bot.db.view_user(ctx.author.id)
             embed.set_footer(text=f"Your balance: ${user_data['balance']:,}")
             
             await ctx.send(embed=embed)
@@ -365,7 +448,7 @@ class Economy(commands.Cog):
         title, items = category_map[category.lower()]
         embed = create_embed(title, "")
         
-        user_data = self.bot.db.get_user(ctx.author.id)
+        user_data = self.bot.db.view_user(ctx.author.id)
         inventory = user_data.get('inventory', {})
         
         for item_id, item_data in items.items():
@@ -413,42 +496,47 @@ class Economy(commands.Cog):
             return
         
         item_data = all_items[item_id]
-        user_data = self.bot.db.get_user(ctx.author.id)
-        
-        # Check if user already owns the item
-        inventory = user_data.get('inventory', {})
-        if item_id in inventory:
-            embed = create_error_embed(
-                "❌ Already Owned",
-                f"You already own **{item_data['name']}**!"
-            )
-            await ctx.send(embed=embed)
-            return
         
-        # Check if user has enough money
-        if user_data['balance'] < item_data['price']:
-            needed = item_data['price'] - user_data['balance']
-            embed = create_error_embed(
-                "❌ Insufficient Funds",
-                f"You need **${needed:,}** more to buy **{item_data['name']}**.\n"
-                f"Required: **${item_data['price']:,}**\n"
-                f"Your balance: **${user_data['balance']:,}**"
-            )
-            await ctx.send(embed=embed)
-            return
+        # Ownership check, payment and inventory change happen as one step
+        # Errors are sent after the lock is released
+        error = None
+        async with self.bot.db.transaction(ctx.author.id):
+            user_data = self.bot.db.view_user(ctx.author.id)
+            
+            # Check if user already owns the item
+            inventory = user_data.get('inventory', {})
+            if item_id in inventory:
+                error = create_error_embed(
+                    "❌ Already Owned",
+                    f"You already own **{item_data['name']}**!"
+                )
+            
+            # Check if user has enough money
+            elif user_data['balance'] < item_data['price']:
+                needed = item_data['price'] - user_data['balance']
+                error = create_error_embed(
+                    "❌ Insufficient Funds",
+                    f"You need **${needed:,}** more to buy **{item_data['name']}**.\n"
+                    f"Required: **${item_data['price']:,}**\n"
+                    f"Your balance: **${user_data['balance']:,}**"
+                )
+            
+            # Process purchase
+            elif not self.bot.db.remove_balance(ctx.author.id, item_data['price'], 'purchase', SHOP_ACCOUNT):
+                error = create_error_embed(
+                    "❌ Purchase Failed",
+                    "Failed to process payment. Please try again."
+                )
+            
+            else:
+                # Add item to inventory
+                self.bot.db.add_to_inventory(ctx.author.id, item_id, item_data)
+                remaining = self.bot.db.view_user(ctx.author.id)['balance']
         
-        # Process purchase
-        if not self.bot.db.remove_balance(ctx.author.id, item_data['price']):
-            embed = create_error_embed(
-                "❌ Purchase Failed",
-                "Failed to process payment. Please try again."
-            )
-            await ctx.send(embed=embed)
+        if error:
+            await ctx.send(embed=error)
             return
         
-        # Add item to inventory
-        self.bot.db.add_to_inventory(ctx.author.id, item_id, item_data)
-        
         # Handle different item types
         if item_data['type'] == 'role':
             await self.handle_role_purchase(ctx, item_id, item_data)
@@ -458,7 +546,7 @@ class Economy(commands.Cog):
         embed = create_success_embed(
             "🛒 Purchase Successful!",
             f"You bought **{item_data['name']}** for **${item_data['price']:,}**!\n"
-            f"Remaining balance: **${user_data['balance'] - item_data['price']:,}**"
+            f"Remaining balance: **${remaining:,}**"
         )
         
         if item_data['type'] == 'item':
@@ -512,7 +600,7 @@ class Economy(commands.Cog):
     async def inventory(self, ctx, user: discord.Member = None):
         """View your or another user's inventory"""
         target = user if user else ctx.author
-        user_data = self.bot.db.get_user(target.id)
+        user_data = self.bot.db.view_user(target.id)
         inventory = user_data.get('inventory', {})
         
         if not inventory:
@@ -587,43 +675,47 @@ class Economy(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        user_data = self.bot.db.get_user(ctx.author.id)
-        inventory = user_data.get('inventory', {})
-        
-        # Find item by name
-        item_to_sell = None
-        item_id = None
-        
-        for inv_item_id, item_info in inventory.items():
-            if item_info.get('name', '').lower() == item_name.lower():
-                item_to_sell = item_info
-                item_id = inv_item_id
-                break
-        
-        if not item_to_sell:
-            embed = create_error_embed(
-                "❌ Item Not Found",
-                f"You don't own an item called **{item_name}**.\nUse `{ctx.prefix}inventory` to see your items."
-            )
-            await ctx.send(embed=embed)
-            return
-        
-        # Calculate sell price (50% of original price)
-        original_price = item_to_sell.get('price', 0)
-        sell_price = original_price // 2
+        # Errors are sent after the lock is released
+        error = None
+        async with self.bot.db.transaction(ctx.author.id):
+            user_data = self.bot.db.view_user(ctx.author.id)
+            inventory = user_data.get('inventory', {})
+            
+            # Find item by name
+            item_to_sell = None
+            item_id = None
+            
+            for inv_item_id, item_info in inventory.items():
+                if item_info.get('name', '').lower() == item_name.lower():
+                    item_to_sell = item_info
+                    item_id = inv_item_id
+                    break
+            
+            if not item_to_sell:
+                error = create_error_embed(
+                    "❌ Item Not Found",
+                    f"You don't own an item called **{item_name}**.\nUse `{ctx.prefix}inventory` to see your items."
+                )
+            else:
+                # Calculate sell price (50% of original price)
+                original_price = item_to_sell.get('price', 0)
+                sell_price = original_price // 2
+                
+                if sell_price == 0:
+                    error = create_error_embed(
+                        "❌ Cannot Sell",
+                        f"**{item_to_sell['name']}** cannot be sold."
+                    )
+                else:
+                    # Remove item from inventory and add money
+                    self.bot.db.remove_from_inventory(ctx.author.id, item_id)
+                    self.bot.db.add_balance(ctx.author.id, sell_price, 'sale', SHOP_ACCOUNT)
+                    new_balance = self.bot.db.view_user(ctx.author.id)['balance']
         
-        if sell_price == 0:
-            embed = create_error_embed(
-                "❌ Cannot Sell",
-                f"**{item_to_sell['name']}** cannot be sold."
-            )
-            await ctx.send(embed=embed)
+        if error:
+            await ctx.send(embed=error)
             return
         
-        # Remove item from inventory and add money
-        self.bot.db.remove_from_inventory(ctx.author.id, item_id)
-        self.bot.db.add_balance(ctx.author.id, sell_price)
-        
         # Remove role if it's a role item
         if item_to_sell.get('type') == 'role':
             try:
@@ -636,7 +728,7 @@ class Economy(commands.Cog):
         embed = create_success_embed(
             "💰 Item Sold!",
             f"You sold **{item_to_sell['name']}** for **${sell_price:,}**!\n"
-            f"New balance: **${user_data['balance'] + sell_price:,}**"
+            f"New balance: **${new_balance:,}**"
         )
         await ctx.send(embed=embed)
     
@@ -649,7 +741,8 @@ class Economy(commands.Cog):
             f"`{ctx.prefix}eco give <user> <amount>` - Give money to user\n"
             f"`{ctx.prefix}eco take <user> <amount>` - Take money from user\n"
             f"`{ctx.prefix}eco set <user> <amount>` - Set user's balance\n"
-            f"`{ctx.prefix}eco reset <user>` - Reset user's economy data"
+            f"`{ctx.prefix}eco reset <user>` - Reset user's economy data\n"
+            f"`{ctx.prefix}eco verify` - Check every balance against the transaction ledger"
         )
         await ctx.send(embed=embed)
     
@@ -662,7 +755,8 @@ class Economy(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        self.bot.db.add_balance(user.id, amount)
+        async with self.bot.db.transaction(user.id):
+            self.bot.db.add_balance(user.id, amount, 'admin_give', ADMIN_ACCOUNT)
         
         embed = create_success_embed(
             "💰 Money Given",
@@ -679,17 +773,17 @@ class Economy(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        if self.bot.db.remove_balance(user.id, amount):
+        async with self.bot.db.transaction(user.id):
+            # Take what they have if it's less than the amount
+            taken = min(amount, self.bot.db.view_user(user.id)['balance'])
+            self.bot.db.remove_balance(user.id, taken, 'admin_take', ADMIN_ACCOUNT)
+        
+        if taken == amount:
             embed = create_success_embed(
                 "💸 Money Taken",
                 f"Took **${amount:,}** from {user.mention}."
             )
         else:
-            # Take what they have
-            user_data = self.bot.db.get_user(user.id)
-            taken = user_data['balance']
-            self.bot.db.update_user(user.id, {'balance': 0})
-            
             embed = create_success_embed(
                 "💸 Money Taken",
                 f"Took **${taken:,}** from {user.mention} (all they had)."
@@ -706,7 +800,8 @@ class Economy(commands.Cog):
             await ctx.send(embed=embed)
             return
         
-        self.bot.db.update_user(user.id, {'balance': amount})
+        async with self.bot.db.transaction(user.id):
+            self.bot.db.update_user(user.id, {'balance': amount})
         
         embed = create_success_embed(
             "💰 Balance Set",
@@ -719,8 +814,8 @@ class Economy(commands.Cog):
     async def reset_user(self, ctx, user: discord.Member):
         """Reset a user's economy data"""
         # Remove user from database
-        if str(user.id) in self.bot.db.users_data:
-            del self.bot.db.users_data[str(user.id)]
+        async with self.bot.db.transaction(user.id):
+            self.bot.db.reset_user(user.id)
         
         embed = create_success_embed(
             "🔄 User Reset",
@@ -728,5 +823,30 @@ class Economy(commands.Cog):
         )
         await ctx.send(embed=embed)
 
+    @economy_admin.command(name='verify')
+    @commands.has_permissions(administrator=True)
+    async def verify_ledger(self, ctx):
+        """Check every stored balance against the transaction ledger"""
+        mismatches = await self.bot.db.verify_ledger()
+        
+        if not mismatches:
+            embed = create_success_embed(
+                "✅ Ledger Verified",
+                "Every balance matches the transaction ledger."
+            )
+        else:
+            lines = [
+                f"{get_user_mention(user_id)}: stored ${stored:,}, ledger ${expected:,}"
+                for user_id, (stored, expected) in list(mismatches.items())[:10]
+            ]
+            if len(mismatches) > 10:
+                lines.append(f"...and {len(mismatches) - 10} more")
+            embed = create_error_embed(
+                f"⚠️ {len(mismatches)} Balance Mismatches",
+                "\n".join(lines)
+            )
+        
+        await ctx.send(embed=embed)
+
 async def setup(bot):
     await bot.add_cog(Economy(bot))
@@ -1,12 +1,27 @@
 
 import discord
 from discord.ext import commands
+import io
 import json
+import logging
 import os
+import re
+import time
 import asyncio
-import aiohttp
-from utils.helpers import create_embed, create_success_embed, create_error_embed, create_warning_embed, is_staff
-from config.settings import BOT_CONFIG
+import zipfile
+from utils.helpers import create_embed, create_success_embed, create_error_embed, create_warning_embed, is_staff, save_json_async
+from utils.counters import UsageCounter
+from utils.rollups import DAY, HOUR, UsageRollup
+from utils.web import DownloadError, DownloadTooLarge
+from utils.images import ImageProcessor, check_emoji_image, read_archive
+from config.settings import BOT_CONFIG, EMOJI_IMPORT_CONFIG, EMOJI_PROCESSING_CONFIG, EMOJI_STATS_CONFIG, STORAGE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Custom emoji markup in message content, e.g. <:name:123> or <a:name:123>
+EMOJI_PATTERN = re.compile(r'<a?:(\w+):(\d+)>')
+
+MAX_EMOJI_SIZE = 256000  # Discord's 256 KB upload limit
 
 class EmojiManager(commands.Cog):
     """Animated emoji support and management system"""
@@ -15,6 +30,34 @@ class EmojiManager(commands.Cog):
         self.bot = bot
         self.emoji_data_file = 'data/emojis.json'
         self.emoji_data = self.load_emoji_data()
+        # Emoji uses are counted in memory and written in batches
+        # Uses are bucketed by the hour they happened in, not the hour they are flushed
+        self.usage = UsageCounter(self.apply_usage, bucket=HOUR)
+        self.rollup = UsageRollup(EMOJI_STATS_CONFIG['hourly_hours'], EMOJI_STATS_CONFIG['daily_days'])
+        self.usage_task = None
+        self.save_task = None
+        # Oversized images are shrunk to fit when Pillow is installed
+        self.images = ImageProcessor(
+            EMOJI_PROCESSING_CONFIG['max_workers'],
+            EMOJI_PROCESSING_CONFIG['cache_size'],
+            EMOJI_PROCESSING_CONFIG['max_side'],
+            EMOJI_PROCESSING_CONFIG['max_frames'],
+            EMOJI_PROCESSING_CONFIG['max_pixels']
+        )
+        self.can_shrink = EMOJI_PROCESSING_CONFIG['enabled'] and self.images.available
+        self.input_limit = EMOJI_PROCESSING_CONFIG['max_input_size'] if self.can_shrink else MAX_EMOJI_SIZE
+    
+    async def cog_load(self):
+        self.usage_task = asyncio.create_task(self.usage.run())
+    
+    async def cog_unload(self):
+        self.images.close()
+        if self.usage_task:
+            self.usage_task.cancel()
+        self.usage.flush()
+        if self.save_task and not self.save_task.done():
+            self.save_task.cancel()
+            await self.write_emoji_data()
     
     def load_emoji_data(self):
         """Load emoji data from file"""
@@ -24,10 +67,62 @@ class EmojiManager(commands.Cog):
         return {}
     
     def save_emoji_data(self):
-        """Save emoji data to file"""
+        """Schedule a save of emoji data; changes made before it runs share one write"""
+        if self.save_task is None or self.save_task.done():
+            self.save_task = asyncio.create_task(self._save_later())
+    
+    async def _save_later(self):
+        await asyncio.sleep(STORAGE_CONFIG['emoji_save_delay'])
+        try:
+            await self.write_emoji_data()
+        except Exception as e:
+            logger.error(f"Failed to save emoji data: {e}")
+    
+    async def write_emoji_data(self):
+        """Write emoji data to file from a worker thread"""
+        # Later changes schedule a new save instead of relying on this one
+        self.save_task = None
+        # Copy the rollup bucket dicts too; usage keeps changing them while the worker serialises
+        snapshot = {
+            guild_id: {
+                emoji_id: {key: dict(value) if isinstance(value, dict) else value for key, value in data.items()}
+                for emoji_id, data in emojis.items()
+            }
+            for guild_id, emojis in self.emoji_data.items()
+        }
         os.makedirs('data', exist_ok=True)
-        with open(self.emoji_data_file, 'w') as f:
-            json.dump(self.emoji_data, f, indent=2)
+        await save_json_async(self.emoji_data_file, snapshot, indent=STORAGE_CONFIG['json_indent'])
+    
+    def apply_usage(self, deltas):
+        """Add batched emoji use counts and save them in one write"""
+        for ((guild_id, emoji_id), hour), count in deltas.items():
+            data = self.emoji_data.get(guild_id, {}).get(emoji_id)
+            if data is not None:
+                data['uses'] += count
+                self.rollup.record(data, count, at=hour)
+        self.save_emoji_data()
+    
+    def size_limit_text(self):
+        """The largest accepted image size, for error messages"""
+        if self.can_shrink:
+            return f"{self.input_limit // (1024 * 1024)} MB"
+        return "256 KB"
+    
+    def track_emoji(self, emoji, creator_id, **extra):
+        """Start tracking data and usage for an emoji the bot created"""
+        guild_id = str(emoji.guild_id)
+        if guild_id not in self.emoji_data:
+            self.emoji_data[guild_id] = {}
+        
+        self.emoji_data[guild_id][str(emoji.id)] = {
+            'name': emoji.name,
+            'creator': creator_id,
+            'created_at': discord.utils.utcnow().isoformat(),
+            'animated': emoji.animated,
+            'uses': 0,
+            **extra
+        }
+        self.save_emoji_data()
     
     @commands.group(name='emoji', aliases=['emote'], invoke_without_command=True)
     async def emoji_group(self, ctx):
@@ -35,13 +130,16 @@ class EmojiManager(commands.Cog):
         embed = create_embed(
             "🎭 Emoji Commands",
             f"`{ctx.prefix}emoji add <name> <url/attachment>` - Add emoji from URL or file\n"
+            f"`{ctx.prefix}emoji import <zip attachment/urls...>` - Add many emojis at once\n"
             f"`{ctx.prefix}emoji remove <name>` - Remove an emoji\n"
             f"`{ctx.prefix}emoji list [page]` - List server emojis\n"
             f"`{ctx.prefix}emoji info <emoji>` - Get emoji information\n"
             f"`{ctx.prefix}emoji steal <emoji> [name]` - Steal emoji from message\n"
             f"`{ctx.prefix}emoji rename <old_name> <new_name>` - Rename emoji\n"
             f"`{ctx.prefix}emoji search <query>` - Search emojis by name\n"
-            f"`{ctx.prefix}emoji stats` - Server emoji statistics"
+            f"`{ctx.prefix}emoji stats` - Server emoji statistics\n"
+            f"`{ctx.prefix}emoji unused [days]` - Emojis nobody used recently\n"
+            f"`{ctx.prefix}emoji trending [days]` - Emojis gaining the most use"
         )
         await ctx.send(embed=embed)
     
@@ -90,10 +188,10 @@ class EmojiManager(commands.Cog):
                 await ctx.send(embed=embed)
                 return
             
-            if attachment.size > 256000:  # 256 KB limit
+            if attachment.size > self.input_limit:
                 embed = create_error_embed(
                     "❌ File Too Large",
-                    "Image must be smaller than 256 KB"
+                    f"Image must be smaller than {self.size_limit_text()}"
                 )
                 await ctx.send(embed=embed)
                 return
@@ -103,26 +201,15 @@ class EmojiManager(commands.Cog):
         elif url:
             # From URL
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(url) as resp:
-                        if resp.status != 200:
-                            embed = create_error_embed(
-                                "❌ Invalid URL",
-                                "Could not download image from URL"
-                            )
-                            await ctx.send(embed=embed)
-                            return
-                        
-                        if int(resp.headers.get('content-length', 0)) > 256000:
-                            embed = create_error_embed(
-                                "❌ File Too Large",
-                                "Image must be smaller than 256 KB"
-                            )
-                            await ctx.send(embed=embed)
-                            return
-                        
-                        image_data = await resp.read()
-            except Exception as e:
+                image_data = await self.bot.web.fetch(url, self.input_limit)
+            except DownloadTooLarge:
+                embed = create_error_embed(
+                    "❌ File Too Large",
+                    f"Image must be smaller than {self.size_limit_text()}"
+                )
+                await ctx.send(embed=embed)
+                return
+            except DownloadError:
                 embed = create_error_embed(
                     "❌ Download Failed",
                     "Failed to download image from URL"
@@ -138,23 +225,25 @@ class EmojiManager(commands.Cog):
             await ctx.send(embed=embed)
             return
         
+        # Shrink oversized images to fit the upload limit
+        if len(image_data) > MAX_EMOJI_SIZE:
+            try:
+                async with ctx.typing():
+                    image_data = await self.images.shrink(image_data, MAX_EMOJI_SIZE)
+            except ValueError as e:
+                embed = create_error_embed(
+                    "❌ File Too Large",
+                    f"Image must be smaller than 256 KB and could not be shrunk: {e}"
+                )
+                await ctx.send(embed=embed)
+                return
+        
         # Create emoji
         try:
             emoji = await ctx.guild.create_custom_emoji(name=name, image=image_data)
             
             # Store emoji data
-            guild_id = str(ctx.guild.id)
-            if guild_id not in self.emoji_data:
-                self.emoji_data[guild_id] = {}
-            
-            self.emoji_data[guild_id][str(emoji.id)] = {
-                'name': name,
-                'creator': ctx.author.id,
-                'created_at': discord.utils.utcnow().isoformat(),
-                'animated': emoji.animated,
-                'uses': 0
-            }
-            self.save_emoji_data()
+            self.track_emoji(emoji, ctx.author.id)
             
             embed = create_success_embed(
                 "✅ Emoji Added",
@@ -172,6 +261,154 @@ class EmojiManager(commands.Cog):
         
         await ctx.send(embed=embed)
     
+    @emoji_group.command(name='import')
+    @commands.has_permissions(manage_emojis=True)
+    async def import_emojis(self, ctx, *urls):
+        """Add many emojis from a zip attachment or a list of image URLs"""
+        attachment = ctx.message.attachments[0] if ctx.message.attachments else None
+        if not urls and not (attachment and attachment.filename.lower().endswith('.zip')):
+            embed = create_error_embed(
+                "❌ Nothing to Import",
+                f"Attach a .zip of images or list image URLs.\nExample: `{ctx.prefix}emoji import <url> <url>`"
+            )
+            await ctx.send(embed=embed)
+            return
+        
+        progress = await ctx.send(embed=create_embed("📥 Importing Emojis", "Collecting images..."))
+        
+        # (filename, bytes or failure reason) for every source
+        files = []
+        if attachment:
+            if attachment.size > EMOJI_IMPORT_CONFIG['max_archive_size']:
+                files.append((attachment.filename, "archive is too large"))
+            else:
+                try:
+                    archive = await attachment.read()
+                except discord.HTTPException as e:
+                    archive = None
+                    files.append((attachment.filename, f"unreadable archive ({e})"))
+                
+                if archive is not None:
+                    if not zipfile.is_zipfile(io.BytesIO(archive)):
+                        embed = create_error_embed(
+                            "❌ Not a Zip File",
+                            f"`{attachment.filename}` is not a zip archive. Attach a .zip of images or list image URLs."
+                        )
+                        await progress.edit(embed=embed)
+                        return
+                    try:
+                        files.extend(await asyncio.to_thread(
+                            read_archive, archive, EMOJI_IMPORT_CONFIG['max_files'], self.input_limit,
+                            EMOJI_IMPORT_CONFIG['max_extracted_size']
+                        ))
+                    except zipfile.BadZipFile as e:
+                        files.append((attachment.filename, f"unreadable archive ({e})"))
+        
+        downloads = asyncio.Semaphore(EMOJI_IMPORT_CONFIG['download_concurrency'])
+        
+        async def download(url):
+            async with downloads:
+                try:
+                    return url.split('?')[0], await self.bot.web.fetch(url, self.input_limit)
+                except DownloadTooLarge:
+                    return url, f"larger than {self.size_limit_text()}"
+                except DownloadError as e:
+                    return url, f"download failed ({e})"
+        
+        urls = urls[:max(0, EMOJI_IMPORT_CONFIG['max_files'] - len(files))]
+        files.extend(await asyncio.gather(*(download(url) for url in urls)))
+        
+        # Shrink, decode and validate every image off the event loop
+        async def check(filename, data):
+            if isinstance(data, str):
+                return filename, data, None
+            try:
+                data = await self.images.shrink(data, MAX_EMOJI_SIZE)
+                return filename, await asyncio.to_thread(check_emoji_image, filename, data, MAX_EMOJI_SIZE), data
+            except ValueError as e:
+                return filename, str(e), None
+            except Exception as e:
+                # One bad file must not abort the rest of the import
+                logger.error(f"Failed to process {filename} for emoji import: {e}")
+                return filename, "could not be processed", None
+        
+        checked = await asyncio.gather(*(check(filename, data) for filename, data in files))
+        
+        # Plan uploads within the free static and animated slots
+        taken = {emoji.name.lower() for emoji in ctx.guild.emojis}
+        free = {
+            False: ctx.guild.emoji_limit - sum(not emoji.animated for emoji in ctx.guild.emojis),
+            True: ctx.guild.emoji_limit - sum(emoji.animated for emoji in ctx.guild.emojis)
+        }
+        planned = []
+        failed = []
+        for filename, result, data in checked:
+            if isinstance(result, str):
+                failed.append((filename, result))
+                continue
+            name, animated = result
+            if name.lower() in taken:
+                failed.append((filename, f"name `{name}` is taken"))
+                continue
+            if free[animated] <= 0:
+                failed.append((filename, "no free emoji slots"))
+                continue
+            taken.add(name.lower())
+            free[animated] -= 1
+            planned.append((name, data))
+        
+        added = []
+        last_update = 0
+        
+        async def report(final=False):
+            nonlocal last_update
+            now = time.monotonic()
+            if not final and now - last_update < EMOJI_IMPORT_CONFIG['progress_interval']:
+                return
+            last_update = now
+            
+            done = len(added) + len(failed)
+            description = (
+                f"**Added:** {len(added)}\n"
+                f"**Failed:** {len(failed)}\n"
+                f"**Progress:** {done}/{len(checked)}"
+            )
+            if final and added:
+                description += "\n\n" + " ".join(str(emoji) for emoji in added[:50])
+            embed = create_embed("📥 Import Complete" if final else "📥 Importing Emojis", description)
+            if final and failed:
+                embed.add_field(
+                    name="Skipped",
+                    value="\n".join(f"`{filename[-40:]}` - {reason}" for filename, reason in failed[:10])
+                          + (f"\n...and {len(failed) - 10} more" if len(failed) > 10 else ""),
+                    inline=False
+                )
+            try:
+                await progress.edit(embed=embed)
+            except discord.HTTPException:
+                pass
+        
+        # discord.py queues requests on the emoji route's rate-limit bucket;
+        # the semaphore keeps only a few uploads waiting on it at a time
+        uploads = asyncio.Semaphore(EMOJI_IMPORT_CONFIG['upload_concurrency'])
+        
+        async def upload(name, data):
+            async with uploads:
+                try:
+                    emoji = await ctx.guild.create_custom_emoji(
+                        name=name, image=data, reason=f"Emoji import by {ctx.author}"
+                    )
+                except discord.HTTPException as e:
+                    failed.append((name, f"upload failed ({e.text or e.status})"))
+                else:
+                    self.track_emoji(emoji, ctx.author.id)
+                    added.append(emoji)
+            await report()
+        
+        await report()
+        await asyncio.gather(*(upload(name, data) for name, data in planned))
+        await report(final=True)
+    
     @emoji_group.command(name='remove', aliases=['delete'])
     @commands.has_permissions(manage_emojis=True)
     async def remove_emoji(self, ctx, emoji: discord.Emoji):
@@ -271,6 +508,7 @@ class EmojiManager(commands.Cog):
             return
         
         # Get stored data
+        self.usage.flush()
         guild_id = str(ctx.guild.id)
         emoji_data = {}
         if guild_id in self.emoji_data and str(emoji.id) in self.emoji_data[guild_id]:
@@ -335,35 +573,21 @@ class EmojiManager(commands.Cog):
         
         try:
             # Download emoji
-            async with aiohttp.ClientSession() as session:
-                async with session.get(emoji.url) as resp:
-                    if resp.status != 200:
-                        embed = create_error_embed(
-                            "❌ Download Failed",
-                            "Could not download the emoji"
-                        )
-                        await ctx.send(embed=embed)
-                        return
-                    
-                    image_data = await resp.read()
+            try:
+                image_data = await self.bot.web.fetch(emoji.url, MAX_EMOJI_SIZE)
+            except DownloadError:
+                embed = create_error_embed(
+                    "❌ Download Failed",
+                    "Could not download the emoji"
+                )
+                await ctx.send(embed=embed)
+                return
             
             # Create emoji
             new_emoji = await ctx.guild.create_custom_emoji(name=name, image=image_data)
             
             # Store data
-            guild_id = str(ctx.guild.id)
-            if guild_id not in self.emoji_data:
-                self.emoji_data[guild_id] = {}
-            
-            self.emoji_data[guild_id][str(new_emoji.id)] = {
-                'name': name,
-                'creator': ctx.author.id,
-                'created_at': discord.utils.utcnow().isoformat(),
-                'animated': new_emoji.animated,
-                'uses': 0,
-                'stolen_from': str(emoji.id)
-            }
-            self.save_emoji_data()
+            self.track_emoji(new_emoji, ctx.author.id, stolen_from=str(emoji.id))
             
             embed = create_success_embed(
                 "✅ Emoji Stolen",
@@ -480,6 +704,7 @@ class EmojiManager(commands.Cog):
         static_emojis = [e for e in emojis if not e.animated]
         
         # Get usage data
+        self.usage.flush()
         guild_id = str(ctx.guild.id)
         total_uses = 0
         most_used = None
@@ -518,6 +743,66 @@ class EmojiManager(commands.Cog):
         
         await ctx.send(embed=embed)
     
+    def tracked_emojis(self, guild):
+        """Pairs of (emoji, stored data) for the guild's emojis that have usage tracking"""
+        self.usage.flush()
+        stored = self.emoji_data.get(str(guild.id), {})
+        tracked = [(emoji, stored[str(emoji.id)]) for emoji in guild.emojis if str(emoji.id) in stored]
+        for _, data in tracked:
+            # Entries nobody used lately were not downsampled by record()
+            self.rollup.downsample(data)
+        return tracked
+    
+    @emoji_group.command(name='unused')
+    async def unused_emojis(self, ctx, days: int = 30):
+        """List tracked emojis with no uses in the last few days"""
+        days = max(1, min(days, EMOJI_STATS_CONFIG['daily_days']))
+        since = discord.utils.utcnow().timestamp() - days * DAY
+        unused = [emoji for emoji, data in self.tracked_emojis(ctx.guild)
+                  if self.rollup.uses_since(data, since) == 0]
+        
+        if not unused:
+            embed = create_embed(
+                "🗑️ Unused Emojis",
+                f"Every tracked emoji was used in the last {days} days."
+            )
+        else:
+            shown = unused[:40]
+            embed = create_embed(
+                f"🗑️ Unused Emojis ({len(unused)})",
+                f"No uses in the last **{days}** days:\n" + " ".join(f"{emoji} `{emoji.name}`" for emoji in shown)
+                + (f"\n...and {len(unused) - len(shown)} more" if len(unused) > len(shown) else "")
+            )
+        embed.set_footer(text="Only emojis added through the bot are tracked")
+        await ctx.send(embed=embed)
+    
+    @emoji_group.command(name='trending')
+    async def trending_emojis(self, ctx, days: int = 7):
+        """Show emojis whose use grew most compared with the period before"""
+        days = max(1, min(days, EMOJI_STATS_CONFIG['daily_days'] // 2))
+        trends = []
+        for emoji, data in self.tracked_emojis(ctx.guild):
+            recent, previous = self.rollup.trend(data, days * DAY)
+            if recent:
+                trends.append((recent - previous, recent, previous, emoji))
+        
+        if not trends:
+            embed = create_embed(
+                "📈 Trending Emojis",
+                f"No tracked emoji was used in the last {days} days."
+            )
+            await ctx.send(embed=embed)
+            return
+        
+        trends.sort(key=lambda x: (x[0], x[1]), reverse=True)
+        lines = []
+        for i, (growth, recent, previous, emoji) in enumerate(trends[:10], 1):
+            change = f"+{growth}" if growth >= 0 else str(growth)
+            lines.append(f"**{i}.** {emoji} `{emoji.name}` - {recent} uses ({change} vs previous {days}d)")
+        
+        embed = create_embed(f"📈 Trending Emojis - Last {days} Days", "\n".join(lines))
+        await ctx.send(embed=embed)
+    
     @commands.Cog.listener()
     async def on_message(self, message):
         """Track emoji usage"""
@@ -528,18 +813,15 @@ class EmojiManager(commands.Cog):
         if guild_id not in self.emoji_data:
             return
         
-        # Find custom emojis in message
-        import re
-        emoji_pattern = re.compile(r'<a?:(\w+):(\d+)>')
-        matches = emoji_pattern.findall(message.content)
-        
-        for name, emoji_id in matches:
-            if emoji_id in self.emoji_data[guild_id]:
-                self.emoji_data[guild_id][emoji_id]['uses'] += 1
+        # Most messages contain no custom emoji markup at all
+        if '<' not in message.content:
+            return
         
-        # Save if any emojis were used
-        if matches:
-            self.save_emoji_data()
+        # Find custom emojis in message
+        tracked = self.emoji_data[guild_id]
+        for name, emoji_id in EMOJI_PATTERN.findall(message.content):
+            if emoji_id in tracked:
+                self.usage.increment((guild_id, emoji_id))
 
 async def setup(bot):
     await bot.add_cog(EmojiManager(bot))
@@ -1,7 +1,7 @@
 import discord
 from discord.ext import commands
 from utils.helpers import create_embed
-from config.settings import BOT_CONFIG
+from config.settings import AUTORESPONSE_CONFIG, BOT_CONFIG
 
 class Help(commands.Cog):
     """Help system for the bot"""
@@ -99,8 +99,11 @@ class Help(commands.Cog):
             (f"{ctx.prefix}daily", "Claim your daily reward (24h cooldown)"),
             (f"{ctx.prefix}work", "Work to earn money (1h cooldown)"),
             (f"{ctx.prefix}pay <user> <amount>", "Pay money to another user"),
+            (f"{ctx.prefix}transactions [before_id]", "View your transaction history"),
             (f"{ctx.prefix}gamble <amount>", "Gamble your money (50/50 chance)"),
             (f"{ctx.prefix}leaderboard [page]", "View the money leaderboard"),
+            (f"{ctx.prefix}serverleaderboard [page]", "View this server's money leaderboard"),
+            (f"{ctx.prefix}rank [user]", "View a leaderboard rank"),
             (f"{ctx.prefix}shop", "View the shop (coming soon)")
         ]
 
@@ -108,7 +111,8 @@ class Help(commands.Cog):
             (f"{ctx.prefix}eco give <user> <amount>", "Give money to a user"),
             (f"{ctx.prefix}eco take <user> <amount>", "Take money from a user"),
             (f"{ctx.prefix}eco set <user> <amount>", "Set a user's balance"),
-            (f"{ctx.prefix}eco reset <user>", "Reset a user's economy data")
+            (f"{ctx.prefix}eco reset <user>", "Reset a user's economy data"),
+            (f"{ctx.prefix}eco verify", "Check balances against the transaction ledger")
         ]
 
         embed.add_field(
@@ -142,7 +146,8 @@ class Help(commands.Cog):
             (f"{ctx.prefix}reply <message>", "Reply to a modmail ticket"),
             (f"{ctx.prefix}close [reason]", "Close a modmail ticket"),
             (f"{ctx.prefix}modmail setup", "Set up modmail category"),
-            (f"{ctx.prefix}modmail stats", "View modmail statistics")
+            (f"{ctx.prefix}modmail stats", "View modmail statistics"),
+            (f"{ctx.prefix}modmail transcript <ticket|user> [page]", "Read a ticket's messages or list a user's tickets")
         ]
 
         embed.add_field(
@@ -201,7 +206,7 @@ class Help(commands.Cog):
         )
 
         commands = [
-            (f"{ctx.prefix}ar add <trigger> <response>", "Add an auto response"),
+            (f"{ctx.prefix}ar add [mode] <trigger> <response>", "Add an auto response"),
             (f"{ctx.prefix}ar remove <trigger>", "Remove an auto response"),
             (f"{ctx.prefix}ar list [page]", "List all auto responses"),
             (f"{ctx.prefix}ar edit <trigger> <new_response>", "Edit an auto response"),
@@ -220,8 +225,10 @@ class Help(commands.Cog):
         embed.add_field(
             name="📝 Notes",
             value="• Triggers are case-insensitive\n"
-                  "• Responses have a 30-second cooldown per user\n"
-                  "• Supports partial word matching",
+                  "• Responses have a 30-second cooldown per user and a per-channel limit\n"
+                  "• Modes: contains (default), word, startswith, exact, regex\n"
+                  f"• Regex triggers only see the first {AUTORESPONSE_CONFIG['regex_max_input']} characters of a message\n"
+                  "• Slow regex patterns are rejected or disabled",
             inline=False
         )
 
@@ -403,10 +410,13 @@ class Help(commands.Cog):
 
         emoji_commands = [
             (f"{ctx.prefix}emoji add <name> <url>", "Add a new emoji (animated or static)"),
+            (f"{ctx.prefix}emoji import <zip/urls>", "Add many emojis from a zip file or URLs"),
             (f"{ctx.prefix}emoji remove <name>", "Remove an emoji"),
             (f"{ctx.prefix}emoji list", "List all custom emojis on the server"),
             (f"{ctx.prefix}emoji download <name>", "Download an emoji file"),
             (f"{ctx.prefix}emoji info <name>", "Get information about an emoji"),
+            (f"{ctx.prefix}emoji unused [days]", "List emojis nobody used recently"),
+            (f"{ctx.prefix}emoji trending [days]", "Show emojis gaining the most use"),
             (f"{ctx.prefix}emoji search <query>", "Search for emojis (coming soon)"),
             (f"{ctx.prefix}emoji animate <name>", "Animate a static emoji (requires configuration)"),
             (f"{ctx.prefix}emoji static <name>", "Convert an animated emoji to static (requires configuration)")
@@ -1,16 +1,99 @@
 import discord
 from discord.ext import commands
 import asyncio
+import re
 from datetime import datetime, timedelta
 from utils.helpers import create_embed, create_success_embed, create_error_embed, is_staff
-from config.settings import MODMAIL_CONFIG
+from config.settings import BOT_CONFIG, MODMAIL_CONFIG
+
+class GuildSelectView(discord.ui.View):
+    """Menu letting a user pick which shared server a new ticket goes to
+    
+    Discord allows at most 25 options per menu, so servers are shown a page
+    at a time with buttons to move between pages.
+    """
+    
+    PAGE_SIZE = 25
+    
+    def __init__(self, guilds, timeout):
+        super().__init__(timeout=timeout)
+        self.guilds = sorted(guilds, key=lambda guild: guild.name.lower())
+        self.guild = None
+        self.page = 0
+        self.pages = max(1, -(-len(self.guilds) // self.PAGE_SIZE))
+        
+        self.select = discord.ui.Select(placeholder="Choose a server")
+        self.select.callback = self.choose
+        self.add_item(self.select)
+        
+        if self.pages > 1:
+            self.previous_button = discord.ui.Button(label="Previous", style=discord.ButtonStyle.secondary)
+            self.previous_button.callback = lambda interaction: self.turn_page(interaction, -1)
+            self.add_item(self.previous_button)
+            self.next_button = discord.ui.Button(label="Next", style=discord.ButtonStyle.secondary)
+            self.next_button.callback = lambda interaction: self.turn_page(interaction, 1)
+            self.add_item(self.next_button)
+        
+        self.show_page()
+    
+    def show_page(self):
+        """Fill the menu with the servers on the current page"""
+        start = self.page * self.PAGE_SIZE
+        self.select.options = [
+            discord.SelectOption(label=guild.name[:100], value=str(guild.id))
+            for guild in self.guilds[start:start + self.PAGE_SIZE]
+        ]
+        if self.pages > 1:
+            self.select.placeholder = f"Choose a server (page {self.page + 1}/{self.pages})"
+            self.previous_button.disabled = self.page == 0
+            self.next_button.disabled = self.page == self.pages - 1
+    
+    async def turn_page(self, interaction, step):
+        self.page = min(max(self.page + step, 0), self.pages - 1)
+        self.show_page()
+        await interaction.response.edit_message(view=self)
+    
+    async def choose(self, interaction):
+        guild_id = int(interaction.data['values'][0])
+        self.guild = next(guild for guild in self.guilds if guild.id == guild_id)
+        await interaction.response.edit_message(
+            content=f"Your message will be sent to the moderators of **{self.guild.name}**.",
+            view=None
+        )
+        self.stop()
 
 class ModMail(commands.Cog):
     """ModMail system for private user-to-moderator communication"""
     
     def __init__(self, bot):
         self.bot = bot
-        self.active_dms = {}  # Track users currently in DM modmail
+        self.active_dms = {}  # user_id -> session of the user's open ticket
+        self.pending_messages = {}  # user_id -> DMs sent while choosing a server
+        self.load_sessions()
+    
+    def load_sessions(self):
+        """Rebuild DM sessions from the open tickets in the database"""
+        self.active_dms.clear()
+        # Oldest first, so a user with several open tickets is routed to the newest
+        tickets = sorted(self.bot.db.get_open_tickets(), key=lambda item: item[1]['created_at'])
+        for ticket_id, ticket in tickets:
+            self.add_session(int(ticket['user_id']), ticket_id, int(ticket['channel_id']), int(ticket['guild_id']))
+    
+    def add_session(self, user_id, ticket_id, channel_id, guild_id):
+        """Route a user's DMs to a ticket"""
+        self.end_session(user_id)
+        self.active_dms[user_id] = {
+            'ticket_id': ticket_id,
+            'channel_id': channel_id,
+            'guild_id': guild_id
+        }
+    
+    def end_session(self, user_id, ticket_id=None):
+        """Stop routing a user's DMs, optionally only if they go to the given ticket"""
+        session = self.active_dms.get(user_id)
+        if session is None or (ticket_id is not None and session['ticket_id'] != ticket_id):
+            return
+        del self.active_dms[user_id]
     
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -23,24 +106,63 @@ class ModMail(commands.Cog):
         if not isinstance(message.channel, discord.DMChannel):
             return
         
-        # Check if user has any mutual guilds with the bot
-        mutual_guilds = [guild for guild in self.bot.guilds if guild.get_member(message.author.id)]
-        
-        if not mutual_guilds:
+        # Messages sent while the server menu is open are kept for the new ticket
+        pending = self.pending_messages.get(message.author.id)
+        if pending is not None:
+            pending.append(message.content)
             return
         
+        # A ticket whose channel was deleted can't take messages; close it and start afresh
+        session = self.active_dms.get(message.author.id)
+        if session is not None and not self.bot.get_channel(session['channel_id']):
+            self.bot.db.close_modmail_ticket(session['ticket_id'], self.bot.user.id)
+            self.end_session(message.author.id)
+        
         # If user is not in an active modmail session, start one
         if message.author.id not in self.active_dms:
-            await self.start_modmail_session(message.author, message.content, mutual_guilds)
+            # Check if user has any mutual guilds with the bot
+            mutual_guilds = self.mutual_guilds(message.author.id)
+            if not mutual_guilds:
+                return
+            
+            if len(mutual_guilds) == 1:
+                guild, content = mutual_guilds[0], message.content
+            else:
+                guild, content = await self.choose_guild(message.author, message.content, mutual_guilds)
+                if guild is None:
+                    return
+            await self.start_modmail_session(message.author, content, guild)
         else:
             # Forward message to existing ticket
             await self.forward_to_modmail(message.author, message.content)
     
-    async def start_modmail_session(self, user, initial_message, guilds):
-        """Start a new modmail session"""
-        # For simplicity, use the first mutual guild
-        guild = guilds[0]
+    def mutual_guilds(self, user_id):
+        """Get the guilds a user shares with the bot from the membership index"""
+        guilds = (self.bot.get_guild(guild_id) for guild_id in self.bot.members.guilds_of(user_id))
+        return [guild for guild in guilds if guild is not None]
+    
+    async def choose_guild(self, user, initial_message, guilds):
+        """Ask a user which server to contact; returns (guild, message) or (None, None)"""
+        self.pending_messages[user.id] = [initial_message]
+        view = GuildSelectView(guilds, MODMAIL_CONFIG['guild_select_timeout'])
+        try:
+            prompt = await user.send("You share several servers with me. Which one do you want to contact?", view=view)
+        except discord.Forbidden:
+            del self.pending_messages[user.id]
+            return None, None
         
+        await view.wait()
+        messages = self.pending_messages.pop(user.id)
+        if view.guild is None:
+            try:
+                await prompt.edit(content="No server was chosen. Send another message to try again.", view=None)
+            except discord.HTTPException:
+                pass
+            return None, None
+        return view.guild, "\n".join(messages)
+    
+    async def start_modmail_session(self, user, initial_message, guild):
+        """Start a new modmail session in a guild"""
         # Check if user already has too many open tickets
         existing_tickets = self.bot.db.get_user_tickets(user.id, guild.id)
         if len(existing_tickets) >= MODMAIL_CONFIG['max_tickets_per_user']:
@@ -77,17 +199,14 @@ class ModMail(commands.Cog):
         ticket_id = self.bot.db.create_modmail_ticket(user.id, guild.id, channel.id)
         
         # Add user to active DMs
-        self.active_dms[user.id] = {
-            'ticket_id': ticket_id,
-            'channel_id': channel.id,
-            'guild_id': guild.id
-        }
+        self.add_session(user.id, ticket_id, channel.id, guild.id)
         
         # Send initial messages
         embed = create_embed(
             "📨 ModMail Ticket Created",
             f"**User:** {user.mention} ({user})\n"
             f"**User ID:** {user.id}\n"
+            f"**Ticket ID:** `{ticket_id}`\n"
             f"**Created:** {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC\n\n"
             f"**Initial Message:**\n{initial_message}"
         )
@@ -122,7 +241,7 @@ class ModMail(commands.Cog):
         
         if not channel:
             # Channel was deleted, clean up
-            del self.active_dms[user.id]
+            self.end_session(user.id)
             return
         
         # Check if user wants to close the ticket
@@ -148,19 +267,20 @@ class ModMail(commands.Cog):
     async def reply_to_ticket(self, ctx, *, message):
         """Reply to a modmail ticket"""
         # Check if this is a modmail channel
-        if not ctx.channel.topic or 'ModMail ticket for' not in ctx.channel.topic:
+        ticket_id = self.bot.db.get_ticket_by_channel(ctx.channel.id)
+        if not ticket_id:
             embed = create_error_embed("❌ Invalid Channel", "This is not a modmail ticket channel.")
             await ctx.send(embed=embed)
             return
         
-        # Extract user ID from channel topic
-        try:
-            user_id = int(ctx.channel.topic.split('(')[1].split(')')[0])
-            user = self.bot.get_user(user_id)
-        except:
-            embed = create_error_embed("❌ Error", "Could not find user for this ticket.")
-            await ctx.send(embed=embed)
-            return
+        ticket = self.bot.db.get_modmail_ticket(ticket_id)
+        user_id = int(ticket['user_id'])
+        user = self.bot.get_user(user_id)
+        if not user:
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except discord.HTTPException:
+                user = None
         
         if not user:
             embed = create_error_embed("❌ User Not Found", "The user for this ticket could not be found.")
@@ -182,11 +302,8 @@ class ModMail(commands.Cog):
             confirm_embed = create_success_embed("✅ Message Sent", f"Reply sent to {user}")
             await ctx.send(embed=confirm_embed)
             
-            # Find ticket ID and add to database
-            for ticket_id, session in self.active_dms.items():
-                if session['channel_id'] == ctx.channel.id:
-                    self.bot.db.add_modmail_message(ticket_id, ctx.author.id, f"[STAFF] {message}")
-                    break
+            # Add to database
+            self.bot.db.add_modmail_message(ticket_id, ctx.author.id, f"[STAFF] {message}")
             
         except discord.Forbidden:
             embed = create_error_embed("❌ Cannot Send", "Could not send message to user (DMs disabled).")
@@ -196,24 +313,17 @@ class ModMail(commands.Cog):
     @is_staff()
     async def close_ticket_command(self, ctx, *, reason="No reason provided"):
         """Close a modmail ticket"""
-        # Check if this is a modmail channel
-        if not ctx.channel.topic or 'ModMail ticket for' not in ctx.channel.topic:
-            embed = create_error_embed("❌ Invalid Channel", "This is not a modmail ticket channel.")
-            await ctx.send(embed=embed)
-            return
-        
-        # Find the ticket ID
-        ticket_id = None
-        for tid, session in self.active_dms.items():
-            if session['channel_id'] == ctx.channel.id:
-                ticket_id = session['ticket_id']
-                break
+        # Find the ticket using this channel
+        ticket_id = self.bot.db.get_ticket_by_channel(ctx.channel.id)
         
         if ticket_id:
             await self.close_ticket(ticket_id, ctx.author.id, reason=reason, channel=ctx.channel)
-        else:
+        elif ctx.channel.topic and 'ModMail ticket for' in ctx.channel.topic:
             # Try to close anyway (in case of database desync)
             await ctx.channel.delete(reason=f"ModMail ticket closed by {ctx.author}")
+        else:
+            embed = create_error_embed("❌ Invalid Channel", "This is not a modmail ticket channel.")
+            await ctx.send(embed=embed)
     
     async def close_ticket(self, ticket_id, closer_id, reason="No reason provided", user=None, channel=None):
         """Close a modmail ticket"""
@@ -221,13 +331,19 @@ class ModMail(commands.Cog):
         if not ticket:
             return
         
-        # Close in database
-        self.bot.db.close_modmail_ticket(ticket_id, closer_id)
+        # Close in database; an archived ticket was closed already, so don't
+        # notify anyone or rewrite its archive again
+        closed = self.bot.db.close_modmail_ticket(ticket_id, closer_id)
         
         # Remove from active DMs
         user_id = int(ticket['user_id'])
-        if user_id in self.active_dms:
-            del self.active_dms[user_id]
+        self.end_session(user_id, ticket_id)
+        
+        if not closed:
+            if channel:
+                embed = create_error_embed("❌ Already Closed", f"Ticket `{ticket_id}` is already closed.")
+                await channel.send(embed=embed)
+            return
         
         # Get user and channel if not provided
         if not user:
@@ -240,7 +356,8 @@ class ModMail(commands.Cog):
         if user:
             embed = create_embed(
                 "🔒 Ticket Closed",
-                f"Your modmail ticket has been closed.\n\n**Reason:** {reason}\n\n"
+                f"Your modmail ticket has been closed.\n\n**Reason:** {reason}\n"
+                f"**Ticket ID:** `{ticket_id}`\n\n"
                 f"If you need further assistance, feel free to send another message."
             )
             try:
@@ -252,8 +369,10 @@ class ModMail(commands.Cog):
         if channel:
             embed = create_embed(
                 "🔒 Ticket Closed",
-                f"This ticket has been closed by <@{closer_id}>.\n**Reason:** {reason}\n\n"
-                f"Channel will be deleted in 10 seconds."
+                f"This ticket has been closed by <@{closer_id}>.\n**Reason:** {reason}\n"
+                f"**Ticket ID:** `{ticket_id}`\n\n"
+                f"Channel will be deleted in 10 seconds. "
+                f"Read it later with `{BOT_CONFIG['prefix']}modmail transcript {ticket_id}`."
             )
             await channel.send(embed=embed)
             
@@ -283,7 +402,8 @@ class ModMail(commands.Cog):
             f"`{ctx.prefix}modmail setup` - Set up modmail category\n"
             f"`{ctx.prefix}reply <message>` - Reply to a ticket\n"
             f"`{ctx.prefix}close [reason]` - Close a ticket\n"
-            f"`{ctx.prefix}modmail stats` - View modmail statistics"
+            f"`{ctx.prefix}modmail stats` - View modmail statistics\n"
+            f"`{ctx.prefix}modmail transcript <ticket|user> [page]` - Read a ticket's messages or list a user's tickets"
         )
         await ctx.send(embed=embed)
     
@@ -319,8 +439,9 @@ class ModMail(commands.Cog):
     @is_staff()
     async def modmail_stats(self, ctx):
         """View modmail statistics"""
-        total_tickets = len(self.bot.db.modmail_data)
-        active_tickets = len([t for t in self.bot.db.modmail_data.values() if t['status'] == 'open'])
+        counts = self.bot.db.get_modmail_counts()
+        total_tickets = counts['total']
+        active_tickets = counts['open']
         active_dms = len(self.active_dms)
         
         embed = create_embed(
@@ -330,6 +451,64 @@ class ModMail(commands.Cog):
             f"**Active DM Sessions:** {active_dms}"
         )
         await ctx.send(embed=embed)
+    
+    @modmail_group.command(name='transcript')
+    @is_staff()
+    async def modmail_transcript(self, ctx, ticket_id: str, page: int = 1):
+        """Read a ticket's messages a page at a time, or list a user's tickets"""
+        ticket = self.bot.db.get_modmail_ticket(ticket_id)
+        
+        # A user mention or ID lists that user's tickets instead
+        user_match = re.fullmatch(r'<@!?(\d+)>|(\d+)', ticket_id)
+        if not ticket and user_match:
+            await self.list_user_tickets(ctx, int(user_match.group(1) or user_match.group(2)))
+            return
+        
+        if not ticket or ticket['guild_id'] != str(ctx.guild.id):
+            embed = create_error_embed("❌ Ticket Not Found", f"No ticket with ID `{ticket_id}` in this server.")
+            await ctx.send(embed=embed)
+            return
+        
+        per_page = MODMAIL_CONFIG['transcript_page_size']
+        total = len(ticket['messages']) if 'messages' in ticket else ticket.get('message_count', 0)
+        pages = max(1, -(-total // per_page))
+        page = min(max(page, 1), pages)
+        messages = self.bot.db.get_ticket_messages(ticket_id, (page - 1) * per_page, per_page)
+        
+        lines = []
+        for message in messages:
+            content = message['content']
+            if len(content) > 300:
+                content = content[:297] + "..."
+            lines.append(f"`{message['timestamp'][:16].replace('T', ' ')}` <@{message['user_id']}>: {content}")
+        
+        embed = create_embed(
+            f"📜 Ticket Transcript ({ticket['status']})",
+            f"**User:** <@{ticket['user_id']}>\n"
+            f"**Opened:** {ticket['created_at'][:16].replace('T', ' ')} UTC\n\n"
+            + ("\n".join(lines) or "No messages.")
+        )
+        embed.set_footer(text=f"Page {page}/{pages} • {total} messages • {ticket_id}")
+        await ctx.send(embed=embed)
+    
+    async def list_user_tickets(self, ctx, user_id):
+        """Show a user's open and closed tickets in this server"""
+        open_ids = self.bot.db.get_user_tickets(user_id, ctx.guild.id)
+        archived = self.bot.db.get_archived_tickets(user_id, ctx.guild.id)
+        
+        lines = [f"`{ticket_id}` - **open**" for ticket_id in open_ids]
+        for ticket_id, ticket in archived[:15]:
+            closed_at = (ticket.get('closed_at') or '')[:16].replace('T', ' ')
+            lines.append(f"`{ticket_id}` - closed {closed_at} UTC, {ticket.get('message_count', 0)} messages")
+        if len(archived) > 15:
+            lines.append(f"...and {len(archived) - 15} older tickets")
+        
+        embed = create_embed(
+            "📜 ModMail Tickets",
+            f"**User:** <@{user_id}>\n\n" + ("\n".join(lines) or "No tickets in this server."),
+            footer=f"Read one with {ctx.prefix}modmail transcript <ticket> [page]"
+        )
+        await ctx.send(embed=embed)
 
 async def setup(bot):
     await bot.add_cog(ModMail(bot))
@@ -27,14 +27,56 @@ MODMAIL_CONFIG = {
     'category_name': 'ModMail',
     'log_channel': 'modmail-logs',
     'close_after_hours': 48,
-    'max_tickets_per_user': 3
+    'max_tickets_per_user': 3,
+    'guild_select_timeout': 60,  # seconds to pick a server when a user shares several
+    'transcript_dir': 'data/transcripts',  # compressed messages of closed tickets
+    'transcript_page_size': 10
+}
+
+# Outgoing HTTP configuration (image downloads)
+HTTP_CONFIG = {
+    'connect_timeout': 5,  # seconds
+    'read_timeout': 10,  # seconds without receiving data
+    'total_timeout': 30,  # seconds for a whole request
+    'pool_size': 20,  # open connections shared by all cogs
+    'dns_cache_ttl': 300  # seconds
+}
+
+# Bulk emoji import configuration
+EMOJI_IMPORT_CONFIG = {
+    'max_files': 100,  # images per import
+    'max_archive_size': 8 * 1024 * 1024,  # bytes
+    'max_extracted_size': 32 * 1024 * 1024,  # bytes of all extracted files together
+    'download_concurrency': 4,
+    'upload_concurrency': 2,
+    'progress_interval': 2  # seconds between progress message edits
+}
+
+# Emoji image processing (needs the optional Pillow package)
+EMOJI_PROCESSING_CONFIG = {
+    'enabled': True,  # shrink images over 256 KB instead of rejecting them
+    'max_input_size': 10 * 1024 * 1024,  # bytes accepted before shrinking
+    'max_side': 128,  # pixels; Discord shows emojis at most this big
+    'max_frames': 200,  # animations with more frames are refused
+    'max_pixels': 50_000_000,  # decoded pixels over all frames
+    'max_workers': 2,  # processes used for resizing
+    'cache_size': 128  # processed images remembered by content hash
+}
+
+# Emoji usage statistics configuration
+EMOJI_STATS_CONFIG = {
+    'hourly_hours': 48,  # recent usage kept per hour
+    'daily_days': 90  # older usage kept per day, then dropped
 }
 
 # Auto-response configuration
 AUTORESPONSE_CONFIG = {
     'enabled': True,
     'cooldown': 30,  # seconds
-    'max_responses_per_minute': 5
+    'max_responses_per_minute': 5,  # per channel
+    'max_guild_responses_per_minute': 20,
+    'regex_time_budget_ms': 10,  # CPU time per search
+    'regex_max_input': 500  # characters of a message regex triggers are run against
 }
 
 # Moderation configuration
@@ -54,6 +96,26 @@ MODERATION_CONFIG = {
 DATA_PATHS = {
     'users': 'data/users.json',
     'modmail': 'data/modmail.json',
+    'modmail_archive': 'data/modmail_archive.json',
     'autoresponse': 'data/autoresponse.json',
     'config': 'data/config.json'
 }
+
+# Storage configuration
+STORAGE_CONFIG = {
+    'backend': os.getenv('STORAGE_BACKEND', 'json'),  # 'json' or 'sqlite'
+    'sqlite_path': os.getenv('SQLITE_PATH', 'data/bot.db'),
+    'autosave_interval': 300,  # 5 minutes
+    'json_indent': None,  # compact snapshots; set to 2 for human-readable files
+    'snapshot_generations': 3,  # older JSON snapshots kept as users.json.1 ... .3
+    'lazy_users': os.getenv('LAZY_USERS', '').lower() in ('1', 'true', 'yes'),  # sqlite backend only
+    'user_cache_size': 50000,  # users kept in memory in lazy mode
+    'journal_enabled': True,
+    'journal_path': 'data/journal.log',
+    'journal_commit_ms': 50,  # group commit interval
+    'ledger_path': 'data/ledger.db',
+    'ledger_flush_ms': 200,  # economy transactions are inserted in batches
+    'usage_flush_interval': 60,  # seconds between applying batched usage counts
+    'usage_max_pending': 1000,  # flush early after this many uses, the most a crash can lose
+    'emoji_save_delay': 5  # seconds; emoji changes within this window share one write
+}
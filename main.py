@@ -4,8 +4,11 @@ import asyncio
 import logging
 import os
 import json
+import signal
 from config.settings import BOT_CONFIG
 from utils.database import Database
+from utils.membership import MembershipIndex
+from utils.web import WebClient
 
 # Set up logging
 logging.basicConfig(
@@ -32,12 +35,16 @@ class DiscordBot(commands.Bot):
             help_command=None
         )
 
-        self.db = Database()
+        self.members = MembershipIndex()
+        self.db = Database(members=self.members)
+        self.web = WebClient()  # shared HTTP session for downloads
         self.status_rotation_task = None
         self.current_status_index = 0
 
     async def setup_hook(self):
         """Load all cogs when the bot starts"""
+        await self.web.start()
+
         cogs_to_load = [
             'cogs.modmail',
             'cogs.economy',
@@ -88,9 +95,30 @@ class DiscordBot(commands.Bot):
             await asyncio.sleep(5)
 
 
+    def index_guild(self, guild):
+        """Record a guild's members and build its leaderboard"""
+        self.members.remove_guild(guild.id)
+        self.members.add_guild(guild.id, (member.id for member in guild.members))
+        self.db.index_guild(guild.id)
+
+    async def on_guild_available(self, guild):
+        """Index a guild once its members have been chunked, at startup or after an outage"""
+        self.index_guild(guild)
+
+    async def on_member_join(self, member):
+        """Keep membership and guild leaderboards current"""
+        self.members.add(member.guild.id, member.id)
+        self.db.guild_member_joined(member.guild.id, member.id)
+
+    async def on_member_remove(self, member):
+        """Keep membership and guild leaderboards current"""
+        self.members.remove(member.guild.id, member.id)
+        self.db.guild_member_left(member.guild.id, member.id)
+
     async def on_guild_join(self, guild):
         """Called when the bot joins a new guild"""
         logger.info(f"Joined guild: {guild.name} (ID: {guild.id})")
+        self.index_guild(guild)
 
         # Calculate total member count across all guilds
         total_members = sum(guild.member_count for guild in self.guilds)
@@ -106,6 +134,8 @@ class DiscordBot(commands.Bot):
     async def on_guild_remove(self, guild):
         """Called when the bot leaves a guild"""
         logger.info(f"Left guild: {guild.name} (ID: {guild.id})")
+        self.members.remove_guild(guild.id)
+        self.db.forget_guild(guild.id)
 
         # Calculate total member count across all guilds
         total_members = sum(guild.member_count for guild in self.guilds)
@@ -118,6 +148,12 @@ class DiscordBot(commands.Bot):
             )
         )
 
+    async def close(self):
+        """Disconnect and unload cogs, then persist data once nothing can change it"""
+        await super().close()
+        await self.web.close()
+        self.db.close()
+
     async def on_command_error(self, ctx, error):
         """Global error handler"""
         if isinstance(error, commands.CommandNotFound):
@@ -153,7 +189,16 @@ async def main():
         return
 
     try:
-        await bot.start(token)
+        # Leaving this block always runs bot.close(), so data is saved on every exit
+        async with bot:
+            # Stop cleanly on SIGTERM too; Ctrl-C already cancels this task
+            try:
+                asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+            except NotImplementedError:
+                pass
+            await bot.start(token)
+    except asyncio.CancelledError:
+        logger.info("Bot stopped")
     except discord.LoginFailure:
         logger.error("Invalid Discord token provided!")
     except Exception as e:
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import time
+from config.settings import STORAGE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class UsageCounter:
+    """Absorbs hot-path usage increments in memory and applies them in batches
+
+    Increments only touch a dict, so counting a use costs no write. The
+    accumulated deltas are handed to `apply` once per flush interval, on
+    shutdown, or early once max_pending uses are waiting, which bounds how
+    many uses a crash can lose. With bucket set to a number of seconds, uses
+    are also split by the time they happened and deltas are keyed by
+    (key, bucket start), so a late flush never moves them to a later bucket.
+    """
+
+    def __init__(self, apply, interval=None, max_pending=None, bucket=None):
+        self.apply = apply
+        self.interval = interval or STORAGE_CONFIG['usage_flush_interval']
+        self.max_pending = max_pending or STORAGE_CONFIG['usage_max_pending']
+        self.bucket = bucket
+        self._counts = {}
+        self._pending = 0
+
+    def __len__(self):
+        return self._pending
+
+    def increment(self, key, amount=1):
+        """Count uses of key"""
+        if self.bucket:
+            now = int(time.time())
+            key = (key, now - now % self.bucket)
+        self._counts[key] = self._counts.get(key, 0) + amount
+        self._pending += amount
+        if self._pending >= self.max_pending:
+            self.flush()
+
+    def flush(self):
+        """Apply every waiting delta in one batch"""
+        if not self._counts:
+            return
+        deltas, self._counts = self._counts, {}
+        self._pending = 0
+        self.apply(deltas)
+
+    async def run(self):
+        """Flush waiting deltas every flush interval"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Usage counter flush failed: {e}")
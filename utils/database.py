@@ -1,18 +1,114 @@
-import json
-import os
 import asyncio
+import logging
+import weakref
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from config.settings import DATA_PATHS, ECONOMY_CONFIG
-from utils.helpers import load_json, save_json
+from types import MappingProxyType
+from config.settings import AUTORESPONSE_CONFIG, ECONOMY_CONFIG, STORAGE_CONFIG
+from utils.counters import UsageCounter
+from utils.indexes import BalanceIndex, GuildLeaderboards, TicketIndex
+from utils.journal import TRANSACTIONS, Journal
+from utils.ledger import SYSTEM_ACCOUNT, Ledger, verify_balances
+from utils.matching import AutoresponseMatcher
+from utils.membership import MembershipIndex
+from utils.records import UserRecord
+from utils.storage import STORES, LazyStore, get_backend
+from utils.transcripts import TranscriptStore
+
+logger = logging.getLogger(__name__)
+
+# Shared read-only stand-in for users who have no stored record yet
+DEFAULT_USER = MappingProxyType({
+    'balance': ECONOMY_CONFIG['starting_balance'],
+    'last_daily': 0,
+    'last_work': 0,
+    'warnings': (),
+    'total_earned': 0,
+    'total_spent': 0,
+    'inventory': MappingProxyType({}),
+    'active_perks': MappingProxyType({}),
+    'created_at': 0
+})
 
 class Database:
-    """Simple JSON-based database for bot data"""
+    """Simple key/value database for bot data, persisted through a storage backend"""
     
-    def __init__(self):
-        self.users_data = load_json(DATA_PATHS['users'], {})
-        self.modmail_data = load_json(DATA_PATHS['modmail'], {})
-        self.autoresponse_data = load_json(DATA_PATHS['autoresponse'], {})
-        self.config_data = load_json(DATA_PATHS['config'], {})
+    def __init__(self, backend=None, members=None):
+        self.backend = backend or get_backend()
+        self.members = members or MembershipIndex()
+        
+        if STORAGE_CONFIG['lazy_users'] and self.backend.supports_lazy_loading:
+            # Only the active working set of users is kept in memory
+            self.users_data = LazyStore(
+                self.backend, 'users', STORAGE_CONFIG['user_cache_size'],
+                decode=UserRecord.from_dict,
+                on_evict=self._write_back_user
+            )
+        else:
+            if STORAGE_CONFIG['lazy_users']:
+                logger.warning("Lazy user loading needs the sqlite backend, loading all users")
+            self.users_data = {
+                user_id: UserRecord.from_dict(data)
+                for user_id, data in self.backend.load('users').items()
+            }
+        self.modmail_data = self.backend.load('modmail')
+        self.modmail_archive_data = self.backend.load('modmail_archive')
+        self.autoresponse_data = self.backend.load('autoresponse')
+        self.config_data = self.backend.load('config')
+        
+        # Keys changed since the last save, per store
+        self._dirty = {store: set() for store in STORES}
+        # Keys handed to a save that has not finished yet
+        self._saving = {store: set() for store in STORES}
+        
+        # I/O counters for the last save cycle and since startup
+        self.flush_stats = {
+            'last_bytes_written': 0,
+            'last_records_flushed': 0,
+            'last_stores_written': 0,
+            'total_bytes_written': 0,
+            'total_records_flushed': 0,
+            'flushes': 0
+        }
+        
+        # Changes since the last snapshot are journaled so a crash between saves loses nothing.
+        # Every balance change is posted to the transaction ledger, and ledger rows are
+        # journaled in the same commits as the balances they change
+        self.journal = None
+        if STORAGE_CONFIG['journal_enabled']:
+            self.journal = Journal()
+        self.ledger = Ledger(journal=self.journal)
+        if self.journal:
+            self._replay_journal()
+            asyncio.create_task(self.journal.run())
+        
+        # Only open tickets stay in the modmail store; closed ones live in the archive
+        # with their messages moved out to compressed transcript files
+        self.transcripts = TranscriptStore()
+        self._archive_closed_tickets()
+        self.ticket_index = TicketIndex(self.modmail_data.items())
+        self.archived_tickets = {}  # (user_id, guild_id) -> archived ticket IDs
+        for ticket_id, ticket in self.modmail_archive_data.items():
+            self.archived_tickets.setdefault((ticket['user_id'], ticket['guild_id']), []).append(ticket_id)
+        
+        # Compiled autoresponse triggers per guild, rebuilt on first use after a change
+        self._matchers = {}
+        
+        # Autoresponse uses are counted in memory and applied in batches
+        self.autoresponse_uses = UsageCounter(self._apply_autoresponse_uses)
+        asyncio.create_task(self.autoresponse_uses.run())
+        
+        # Per-user locks for balance changes that span awaits; unused locks are dropped
+        self._user_locks = weakref.WeakValueDictionary()
+        
+        self._open_ledger()
+        asyncio.create_task(self.ledger.run())
+        
+        # Users ordered by balance for leaderboards and ranks
+        self.balance_index = BalanceIndex(self._user_balances())
+        
+        # Per-guild balance indexes, built as guilds become available
+        self.guild_leaderboards = GuildLeaderboards(self.members)
         
         # Auto-save every 5 minutes
         asyncio.create_task(self._auto_save())
@@ -20,67 +116,313 @@ class Database:
     async def _auto_save(self):
         """Auto-save data every 5 minutes"""
         while True:
-            await asyncio.sleep(300)  # 5 minutes
-            self.save_all()
+            await asyncio.sleep(STORAGE_CONFIG['autosave_interval'])
+            try:
+                await self.save_all_async()
+            except Exception as e:
+                logger.error(f"Auto-save failed: {e}")
+    
+    def _store_data(self, store):
+        """Get the in-memory dict backing a store"""
+        return getattr(self, f'{store}_data')
+    
+    def _mark_dirty(self, store, key):
+        """Record that a key in a store changed since the last save"""
+        key = str(key)
+        self._dirty[store].add(key)
+        data = self._store_data(store)
+        value = data.peek(key) if isinstance(data, LazyStore) else data.get(key)
+        if self.journal:
+            self.journal.record(store, key, value)
+        if store == 'users':
+            self._reindex_user(key, value)
+    
+    def _reindex_user(self, user_id, user):
+        """Keep the balance index in step with a changed or deleted user"""
+        if user is None:
+            self.balance_index.remove(user_id)
+            self.guild_leaderboards.update(user_id, None)
+        else:
+            self.balance_index.update(user_id, user['balance'])
+            self.guild_leaderboards.update(user_id, user['balance'])
+    
+    def _write_back_user(self, user_id, user):
+        """Persist a user evicted from the lazy cache if it has unsaved changes
+
+        Users in a save still in flight are written too, as that save may
+        fail and put them back in the dirty set after they left the cache.
+        """
+        if user_id in self._dirty['users'] or user_id in self._saving['users']:
+            self.backend.save('users', {user_id: user}, [user_id])
+            self._dirty['users'].discard(user_id)
+    
+    def _save_view(self, store, changed):
+        """Get the mapping a backend should read the changed records from and the keys to delete"""
+        data = self._store_data(store)
+        if isinstance(data, LazyStore):
+            return data.snapshot(changed)
+        return data, {key for key in changed if key not in data}
+    
+    def get_cache_stats(self):
+        """Get hit/miss statistics for the lazy user cache, if enabled"""
+        if isinstance(self.users_data, LazyStore):
+            return dict(self.users_data.stats, cached=len(self.users_data))
+        return None
+    
+    def _replay_journal(self):
+        """Apply journaled changes made after the last snapshot"""
+        replayed = 0
+        transactions = []
+        for store, key, value in self.journal.replay():
+            if store == TRANSACTIONS:
+                transactions.append(value)
+                continue
+            
+            data = self._store_data(store)
+            if value is None:
+                data.pop(key, None)
+            elif store == 'users':
+                data[key] = UserRecord.from_dict(value)
+            else:
+                data[key] = value
+            self._dirty[store].add(key)
+            replayed += 1
+        
+        if replayed:
+            logger.info(f"Replayed {replayed} journal entries on top of the last snapshot")
+        if transactions:
+            self.ledger.recover(transactions)
+    
+    def _take_dirty(self):
+        """Detach the dirty keys to save, so changes made during the save are tracked anew"""
+        changes = {store: keys for store, keys in self._dirty.items() if keys}
+        offset = None
+        if self.journal and changes:
+            # Journal entries up to here will be covered by the snapshot, and the
+            # ledger rows among them must be inserted before the journal is compacted
+            self.ledger.flush()
+            offset = self.journal.checkpoint()
+        
+        self._dirty = {store: set() for store in STORES}
+        for store, keys in changes.items():
+            self._saving[store] |= keys
+        return changes, offset
+    
+    def _restore_dirty(self, changes):
+        """Mark keys dirty again after a failed save"""
+        for store, keys in changes.items():
+            self._dirty[store] |= keys
+            self._saving[store] -= keys
+    
+    def _finish_save(self, changes, offset, bytes_written):
+        """Update flush counters and compact the journal after a save"""
+        records_flushed = sum(len(keys) for keys in changes.values())
+        for store, keys in changes.items():
+            self._saving[store] -= keys
+        if isinstance(self.users_data, LazyStore) and 'users' in changes:
+            self.users_data.forget_deleted(changes['users'] - self._dirty['users'])
+        
+        stats = self.flush_stats
+        stats['last_bytes_written'] = bytes_written
+        stats['last_records_flushed'] = records_flushed
+        stats['last_stores_written'] = len(changes)
+        stats['total_bytes_written'] += bytes_written
+        stats['total_records_flushed'] += records_flushed
+        stats['flushes'] += 1
+        
+        if offset is not None:
+            self.journal.compact(offset)
+        
+        if records_flushed:
+            logger.debug(
+                f"Flushed {records_flushed} records from {len(changes)} stores ({bytes_written} bytes)"
+            )
+        
+        return records_flushed
     
     def save_all(self):
-        """Save all data to files"""
-        save_json(DATA_PATHS['users'], self.users_data)
-        save_json(DATA_PATHS['modmail'], self.modmail_data)
-        save_json(DATA_PATHS['autoresponse'], self.autoresponse_data)
-        save_json(DATA_PATHS['config'], self.config_data)
+        """Save the stores that changed since the last save"""
+        changes, offset = self._take_dirty()
+        bytes_written = 0
+        try:
+            for store, changed in changes.items():
+                data, deleted = self._save_view(store, changed)
+                bytes_written += self.backend.save(store, data, changed, deleted) or 0
+        except Exception:
+            self._restore_dirty(changes)
+            raise
+        
+        return self._finish_save(changes, offset, bytes_written)
+    
+    async def save_all_async(self):
+        """Save the stores that changed from a worker thread, keeping the event loop free"""
+        changes, offset = self._take_dirty()
+        bytes_written = 0
+        try:
+            for store, changed in changes.items():
+                bytes_written += await self._save_store_async(store, changed)
+        except Exception:
+            self._restore_dirty(changes)
+            raise
+        
+        return self._finish_save(changes, offset, bytes_written)
+    
+    async def _save_store_async(self, store, changed):
+        """Save one store off the event loop, retrying if a command resizes it mid-write"""
+        data, deleted = self._save_view(store, changed)
+        for _ in range(3):
+            try:
+                return await self.backend.save_async(store, data, changed, deleted) or 0
+            except RuntimeError:
+                # Dictionary changed size during serialization; the journal covers
+                # any record caught half-updated, so simply try again
+                continue
+        
+        return self.backend.save(store, data, changed, deleted) or 0
+    
+    def close(self):
+        """Save pending changes and release the journal, ledger and backend"""
+        self.autoresponse_uses.flush()
+        self.save_all()
+        if self.journal:
+            self.journal.close()
+        self.ledger.close()
+        self.backend.close()
+    
+    def _user_balances(self):
+        """Get (user_id, balance) pairs for every user without decoding cold records"""
+        if isinstance(self.users_data, LazyStore):
+            return list(self.users_data.field_items('balance', 0))
+        return [(user_id, user['balance']) for user_id, user in self.users_data.items()]
+    
+    async def verify_ledger(self):
+        """Compare every stored balance with the ledger off the event loop"""
+        # Flushing waits for any batch being inserted, then balances are read
+        # before anything else can be posted; transactions posted while the
+        # comparison runs are left out by ID
+        self.ledger.flush()
+        before = self.ledger.next_id
+        balances = self._user_balances()
+        return await asyncio.to_thread(
+            lambda: verify_balances(self.ledger.written_balances(before), balances)
+        )
+    
+    def _open_ledger(self):
+        """Post opening balances for users with no transactions, such as those from before the ledger"""
+        accounts = self.ledger.accounts()
+        for user_id, balance in self._user_balances():
+            if balance and user_id not in accounts:
+                self.ledger.post('opening', SYSTEM_ACCOUNT, user_id, balance)
     
     # User data methods
     def get_user(self, user_id):
         """Get user data"""
         user_id = str(user_id)
         if user_id not in self.users_data:
-            self.users_data[user_id] = {
-                'balance': ECONOMY_CONFIG['starting_balance'],
-                'last_daily': 0,
-                'last_work': 0,
-                'warnings': [],
-                'total_earned': 0,
-                'total_spent': 0,
-                'inventory': {},
-                'active_perks': {},
-                'created_at': datetime.utcnow().isoformat()
-            }
+            self.users_data[user_id] = UserRecord(
+                balance=ECONOMY_CONFIG['starting_balance']
+            )
+            self.ledger.post('opening', SYSTEM_ACCOUNT, user_id, ECONOMY_CONFIG['starting_balance'])
+            self._mark_dirty('users', user_id)
         return self.users_data[user_id]
     
+    def view_user(self, user_id):
+        """Get user data for reading, without creating a record for unknown users"""
+        user = self.users_data.get(str(user_id))
+        return DEFAULT_USER if user is None else user
+    
     def update_user(self, user_id, data):
         """Update user data"""
         user_id = str(user_id)
         user = self.get_user(user_id)
+        if 'balance' in data and data['balance'] != user['balance']:
+            delta = data['balance'] - user['balance']
+            if delta > 0:
+                self.ledger.post('adjustment', SYSTEM_ACCOUNT, user_id, delta)
+            else:
+                self.ledger.post('adjustment', user_id, SYSTEM_ACCOUNT, -delta)
         user.update(data)
         self.users_data[user_id] = user
+        self._mark_dirty('users', user_id)
     
-    def add_balance(self, user_id, amount):
-        """Add balance to user"""
+    def add_balance(self, user_id, amount, tx_type='credit', source=SYSTEM_ACCOUNT):
+        """Add balance to user, recording it as a transfer from source"""
         user = self.get_user(user_id)
         user['balance'] += amount
         user['total_earned'] += amount
-        self.update_user(user_id, user)
+        self.ledger.post(tx_type, source, user_id, amount)
+        self._mark_dirty('users', user_id)
     
-    def remove_balance(self, user_id, amount):
-        """Remove balance from user"""
-        user = self.get_user(user_id)
-        if user['balance'] >= amount:
+    def remove_balance(self, user_id, amount, tx_type='debit', destination=SYSTEM_ACCOUNT):
+        """Remove balance from user, recording it as a transfer to destination"""
+        if self.view_user(user_id)['balance'] >= amount:
+            user = self.get_user(user_id)
             user['balance'] -= amount
             user['total_spent'] += amount
-            self.update_user(user_id, user)
+            self.ledger.post(tx_type, user_id, destination, amount)
+            self._mark_dirty('users', user_id)
             return True
         return False
     
+    def transfer(self, src_id, dst_id, amount, tx_type='transfer'):
+        """Move balance between two users as one transaction"""
+        if self.view_user(src_id)['balance'] < amount:
+            return False
+        
+        src = self.get_user(src_id)
+        dst = self.get_user(dst_id)
+        src['balance'] -= amount
+        src['total_spent'] += amount
+        dst['balance'] += amount
+        dst['total_earned'] += amount
+        self.ledger.post(tx_type, src_id, dst_id, amount)
+        self._mark_dirty('users', src_id)
+        self._mark_dirty('users', dst_id)
+        return True
+    
+    def _user_lock(self, user_id):
+        lock = self._user_locks.get(user_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._user_locks[user_id] = lock
+        return lock
+    
+    @asynccontextmanager
+    async def transaction(self, *user_ids):
+        """Hold the locks of several users while checking and changing their balances
+        
+        Locks are taken in sorted ID order so two transactions over the same
+        users can never deadlock.
+        """
+        locks = [self._user_lock(user_id) for user_id in sorted({str(user_id) for user_id in user_ids})]
+        acquired = []
+        try:
+            for lock in locks:
+                await lock.acquire()
+                acquired.append(lock)
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+    
+    async def transfer_locked(self, src_id, dst_id, amount, tx_type='transfer'):
+        """Transfer between users while holding both of their locks"""
+        async with self.transaction(src_id, dst_id):
+            return self.transfer(src_id, dst_id, amount, tx_type)
+    
+    def get_transactions(self, user_id, before=None, limit=10):
+        """Get a user's transactions newest first; pass the last ID seen as before for the next page"""
+        return self.ledger.history(str(user_id), before=before, limit=limit)
+    
     def can_daily(self, user_id):
         """Check if user can claim daily reward"""
-        user = self.get_user(user_id)
+        user = self.view_user(user_id)
         now = datetime.utcnow().timestamp()
         return now - user['last_daily'] >= ECONOMY_CONFIG['daily_cooldown']
     
     def can_work(self, user_id):
         """Check if user can work"""
-        user = self.get_user(user_id)
+        user = self.view_user(user_id)
         now = datetime.utcnow().timestamp()
         return now - user['last_work'] >= ECONOMY_CONFIG['work_cooldown']
     
@@ -91,7 +433,8 @@ class Database:
         
         user = self.get_user(user_id)
         user['last_daily'] = datetime.utcnow().timestamp()
-        self.add_balance(user_id, ECONOMY_CONFIG['daily_amount'])
+        self._mark_dirty('users', user_id)
+        self.add_balance(user_id, ECONOMY_CONFIG['daily_amount'], 'daily')
         return True
     
     def work(self, user_id, amount):
@@ -101,7 +444,8 @@ class Database:
         
         user = self.get_user(user_id)
         user['last_work'] = datetime.utcnow().timestamp()
-        self.add_balance(user_id, amount)
+        self._mark_dirty('users', user_id)
+        self.add_balance(user_id, amount, 'work')
         return True
     
     def add_warning(self, user_id, guild_id, reason, moderator_id):
@@ -114,26 +458,72 @@ class Database:
             'timestamp': datetime.utcnow().isoformat()
         }
         user['warnings'].append(warning)
-        self.update_user(user_id, user)
+        self._mark_dirty('users', user_id)
         return len(user['warnings'])
     
     def get_warnings(self, user_id, guild_id=None):
         """Get user warnings"""
-        user = self.get_user(user_id)
-        warnings = user['warnings']
+        user = self.view_user(user_id)
+        warnings = list(user.get('warnings', []))
         
         if guild_id:
             warnings = [w for w in warnings if w['guild_id'] == str(guild_id)]
         
         return warnings
     
+    def get_leaderboard(self, start, count):
+        """Get (user_id, balance) pairs ranked by balance, starting at a 0-based position"""
+        return self.balance_index.page(start, count)
+    
+    def get_rank(self, user_id):
+        """Get a user's 1-based balance rank, or None if they have no record"""
+        return self.balance_index.rank(str(user_id))
+    
+    def get_ranked_count(self):
+        """Get the number of users on the leaderboard"""
+        return len(self.balance_index)
+    
+    def index_guild(self, guild_id):
+        """Build a guild's leaderboard from the members recorded in the membership index"""
+        balances = []
+        for member_id in self.members.members_of(guild_id):
+            balance = self.balance_index.balance_of(str(member_id))
+            if balance is not None:
+                balances.append((str(member_id), balance))
+        self.guild_leaderboards.build(guild_id, balances)
+    
+    def forget_guild(self, guild_id):
+        """Drop the leaderboard of a guild the bot left"""
+        self.guild_leaderboards.drop(guild_id)
+    
+    def guild_member_joined(self, guild_id, user_id):
+        """Add a new member to their guild's leaderboard if they have a balance"""
+        user_id = str(user_id)
+        self.guild_leaderboards.add_member(guild_id, user_id, self.balance_index.balance_of(user_id))
+    
+    def guild_member_left(self, guild_id, user_id):
+        """Remove a departed member from their guild's leaderboard"""
+        self.guild_leaderboards.remove_member(guild_id, str(user_id))
+    
+    def get_guild_leaderboard(self, guild_id, start, count):
+        """Get (user_id, balance) pairs ranked by balance among a guild's members"""
+        index = self.guild_leaderboards.get(guild_id)
+        return index.page(start, count) if index else []
+    
+    def get_guild_rank(self, guild_id, user_id):
+        """Get a user's 1-based balance rank within a guild"""
+        index = self.guild_leaderboards.get(guild_id)
+        return index.rank(str(user_id)) if index else None
+    
+    def get_guild_ranked_count(self, guild_id):
+        """Get the number of ranked members in a guild"""
+        index = self.guild_leaderboards.get(guild_id)
+        return len(index) if index else 0
+    
     # Inventory methods
     def add_to_inventory(self, user_id, item_id, item_data):
         """Add item to user's inventory"""
         user = self.get_user(user_id)
-        if 'inventory' not in user:
-            user['inventory'] = {}
-        
         user['inventory'][item_id] = {
             'name': item_data['name'],
             'type': item_data['type'],
@@ -149,37 +539,34 @@ class Database:
         elif item_data['type'] == 'role':
             user['inventory'][item_id]['color'] = item_data.get('color', 0)
         
-        self.update_user(user_id, user)
+        self._mark_dirty('users', user_id)
     
     def remove_from_inventory(self, user_id, item_id):
         """Remove item from user's inventory"""
-        user = self.get_user(user_id)
-        if 'inventory' in user and item_id in user['inventory']:
+        if item_id in self.view_user(user_id).get('inventory', {}):
+            user = self.get_user(user_id)
             del user['inventory'][item_id]
-            self.update_user(user_id, user)
+            self._mark_dirty('users', user_id)
             return True
         return False
     
     def activate_perk(self, user_id, perk_id, expiry):
         """Activate a perk for a user"""
         user = self.get_user(user_id)
-        if 'active_perks' not in user:
-            user['active_perks'] = {}
-        
         user['active_perks'][perk_id] = {
             'activated_at': datetime.utcnow().isoformat(),
             'expires_at': expiry.isoformat()
         }
         
         # Add expiry to inventory item
-        if 'inventory' in user and perk_id in user['inventory']:
+        if perk_id in user.get('inventory', {}):
             user['inventory'][perk_id]['expiry'] = expiry.isoformat()
         
-        self.update_user(user_id, user)
+        self._mark_dirty('users', user_id)
     
     def is_perk_active(self, user_id, perk_id):
         """Check if a perk is active for a user"""
-        user = self.get_user(user_id)
+        user = self.view_user(user_id)
         active_perks = user.get('active_perks', {})
         
         if perk_id not in active_perks:
@@ -190,7 +577,7 @@ class Database:
     
     def get_active_perks(self, user_id):
         """Get all active perks for a user"""
-        user = self.get_user(user_id)
+        user = self.view_user(user_id)
         active_perks = user.get('active_perks', {})
         current_time = datetime.utcnow()
         
@@ -202,6 +589,18 @@ class Database:
         
         return valid_perks
     
+    def reset_user(self, user_id):
+        """Delete all data stored for a user"""
+        user_id = str(user_id)
+        if user_id in self.users_data:
+            balance = self.users_data[user_id]['balance']
+            if balance:
+                self.ledger.post('reset', user_id, SYSTEM_ACCOUNT, balance)
+            del self.users_data[user_id]
+            self._mark_dirty('users', user_id)
+            return True
+        return False
+    
     # Modmail methods
     def create_modmail_ticket(self, user_id, guild_id, channel_id):
         """Create a modmail ticket"""
@@ -214,18 +613,61 @@ class Database:
             'status': 'open',
             'messages': []
         }
+        self.ticket_index.add(ticket_id, self.modmail_data[ticket_id])
+        self._mark_dirty('modmail', ticket_id)
         return ticket_id
     
     def get_modmail_ticket(self, ticket_id):
-        """Get modmail ticket"""
-        return self.modmail_data.get(ticket_id)
+        """Get modmail ticket, open or archived"""
+        ticket = self.modmail_data.get(ticket_id)
+        if ticket is None:
+            ticket = self.modmail_archive_data.get(ticket_id)
+        return ticket
     
     def close_modmail_ticket(self, ticket_id, closer_id):
-        """Close modmail ticket"""
-        if ticket_id in self.modmail_data:
-            self.modmail_data[ticket_id]['status'] = 'closed'
-            self.modmail_data[ticket_id]['closed_by'] = str(closer_id)
-            self.modmail_data[ticket_id]['closed_at'] = datetime.utcnow().isoformat()
+        """Close modmail ticket and move it to the archive; returns False if it was not open"""
+        ticket = self.modmail_data.get(ticket_id)
+        if ticket is None or ticket['status'] == 'closed':
+            return False
+        
+        self.modmail_data.pop(ticket_id)
+        ticket['status'] = 'closed'
+        ticket['closed_by'] = str(closer_id)
+        ticket['closed_at'] = datetime.utcnow().isoformat()
+        self.ticket_index.remove(ticket_id, ticket)
+        self._mark_dirty('modmail', ticket_id)
+        self._archive_ticket(ticket_id, ticket)
+        self.archived_tickets.setdefault((ticket['user_id'], ticket['guild_id']), []).append(ticket_id)
+        return True
+    
+    def _archive_ticket(self, ticket_id, ticket):
+        """Store a closed ticket in the archive, writing its messages to a transcript file"""
+        if 'messages' in ticket:
+            try:
+                self.transcripts.write(ticket_id, ticket['messages'])
+            except OSError as e:
+                # Keep the messages inline rather than lose them
+                logger.error(f"Could not write transcript for ticket {ticket_id}: {e}")
+            else:
+                ticket['message_count'] = len(ticket.pop('messages'))
+        
+        self.modmail_archive_data[ticket_id] = ticket
+        self._mark_dirty('modmail_archive', ticket_id)
+    
+    def _archive_closed_tickets(self):
+        """Move closed tickets and inline archived messages out of the hot stores"""
+        closed = [ticket_id for ticket_id, ticket in self.modmail_data.items() if ticket['status'] != 'open']
+        for ticket_id in closed:
+            ticket = self.modmail_data.pop(ticket_id)
+            self._mark_dirty('modmail', ticket_id)
+            self._archive_ticket(ticket_id, ticket)
+        
+        inline = [ticket_id for ticket_id, ticket in self.modmail_archive_data.items() if 'messages' in ticket]
+        for ticket_id in inline:
+            self._archive_ticket(ticket_id, self.modmail_archive_data[ticket_id])
+        
+        if closed or inline:
+            logger.info(f"Archived {len(set(closed) | set(inline))} closed modmail tickets")
     
     def add_modmail_message(self, ticket_id, user_id, content):
         """Add message to modmail ticket"""
@@ -236,33 +678,60 @@ class Database:
                 'timestamp': datetime.utcnow().isoformat()
             }
             self.modmail_data[ticket_id]['messages'].append(message)
+            self._mark_dirty('modmail', ticket_id)
+    
+    def get_ticket_messages(self, ticket_id, start, count):
+        """Get a page of a ticket's messages, reading archived ones from its transcript"""
+        ticket = self.get_modmail_ticket(ticket_id)
+        if ticket is None:
+            return []
+        if 'messages' in ticket:
+            return ticket['messages'][start:start + count]
+        return self.transcripts.read(ticket_id, start, count)
     
     def get_user_tickets(self, user_id, guild_id):
         """Get user's active tickets"""
-        user_id = str(user_id)
-        guild_id = str(guild_id)
-        
-        tickets = []
-        for ticket_id, ticket in self.modmail_data.items():
-            if (ticket['user_id'] == user_id and 
-                ticket['guild_id'] == guild_id and 
-                ticket['status'] == 'open'):
-                tickets.append(ticket_id)
-        
-        return tickets
+        return list(self.ticket_index.user_tickets(str(user_id), str(guild_id)))
+    
+    def get_archived_tickets(self, user_id, guild_id):
+        """Get (ticket_id, ticket) pairs for a user's closed tickets in a guild, newest first"""
+        ticket_ids = self.archived_tickets.get((str(user_id), str(guild_id)), ())
+        tickets = [(ticket_id, self.modmail_archive_data[ticket_id]) for ticket_id in ticket_ids]
+        return sorted(tickets, key=lambda item: item[1].get('closed_at') or '', reverse=True)
+    
+    def get_ticket_by_channel(self, channel_id):
+        """Get the ID of the open ticket using a channel, or None"""
+        return self.ticket_index.by_channel(str(channel_id))
+    
+    def get_open_tickets(self):
+        """Get (ticket_id, ticket) pairs for every open ticket"""
+        return list(self.modmail_data.items())
+    
+    def get_modmail_counts(self):
+        """Get the number of open and closed tickets"""
+        open_tickets = len(self.modmail_data)
+        closed_tickets = len(self.modmail_archive_data)
+        return {'open': open_tickets, 'closed': closed_tickets, 'total': open_tickets + closed_tickets}
     
     # Auto-response methods
-    def add_autoresponse(self, guild_id, trigger, response):
-        """Add auto-response"""
+    def add_autoresponse(self, guild_id, trigger, response, mode='contains'):
+        """Add auto-response; mode is one of utils.matching.MATCH_MODES"""
         guild_id = str(guild_id)
         if guild_id not in self.autoresponse_data:
             self.autoresponse_data[guild_id] = {}
         
-        self.autoresponse_data[guild_id][trigger.lower()] = {
+        data = {
             'response': response,
             'created_at': datetime.utcnow().isoformat(),
-            'uses': 0
+            'uses': 0,
+            'mode': mode
         }
+        if mode == 'regex':
+            # Lowercasing would change the meaning of classes like \S
+            data['pattern'] = trigger
+        self.autoresponse_data[guild_id][trigger.lower()] = data
+        self._matchers.pop(guild_id, None)
+        self._mark_dirty('autoresponse', guild_id)
     
     def remove_autoresponse(self, guild_id, trigger):
         """Remove auto-response"""
@@ -271,26 +740,63 @@ class Database:
             trigger = trigger.lower()
             if trigger in self.autoresponse_data[guild_id]:
                 del self.autoresponse_data[guild_id][trigger]
+                self._matchers.pop(guild_id, None)
+                self._mark_dirty('autoresponse', guild_id)
                 return True
         return False
     
+    def clear_autoresponses(self, guild_id):
+        """Remove all auto-responses for guild"""
+        guild_id = str(guild_id)
+        self.autoresponse_data[guild_id] = {}
+        self._matchers.pop(guild_id, None)
+        self._mark_dirty('autoresponse', guild_id)
+    
     def get_autoresponse(self, guild_id, message_content):
         """Get auto-response for message"""
         guild_id = str(guild_id)
-        if guild_id not in self.autoresponse_data:
+        autoresponses = self.autoresponse_data.get(guild_id)
+        if not autoresponses:
             return None
         
-        message_content = message_content.lower()
-        for trigger, data in self.autoresponse_data[guild_id].items():
-            if trigger in message_content:
-                self.autoresponse_data[guild_id][trigger]['uses'] += 1
-                return data['response']
+        matcher = self._matchers.get(guild_id)
+        if matcher is None:
+            matcher = AutoresponseMatcher(
+                autoresponses,
+                AUTORESPONSE_CONFIG['regex_time_budget_ms'] / 1000,
+                AUTORESPONSE_CONFIG['regex_max_input']
+            )
+            self._matchers[guild_id] = matcher
         
-        return None
+        # Earliest-added trigger wins when several match the message
+        trigger = matcher.search(message_content)
+        if matcher.over_budget:
+            for key in matcher.over_budget:
+                autoresponses[key]['disabled'] = True
+                logger.warning(f"Disabled slow autoresponse regex {key!r} in guild {guild_id}")
+            self._matchers.pop(guild_id, None)
+            self._mark_dirty('autoresponse', guild_id)
+        if trigger is None:
+            return None
+        
+        self.autoresponse_uses.increment((guild_id, trigger))
+        return autoresponses[trigger]['response']
+    
+    def _apply_autoresponse_uses(self, deltas):
+        """Add batched use counts, marking each changed guild dirty once"""
+        changed = set()
+        for (guild_id, trigger), count in deltas.items():
+            data = self.autoresponse_data.get(guild_id, {}).get(trigger)
+            if data is not None:
+                data['uses'] += count
+                changed.add(guild_id)
+        for guild_id in changed:
+            self._mark_dirty('autoresponse', guild_id)
     
     def get_guild_autoresponses(self, guild_id):
         """Get all auto-responses for guild"""
         guild_id = str(guild_id)
+        self.autoresponse_uses.flush()
         return self.autoresponse_data.get(guild_id, {})
     
     # Config methods
@@ -306,6 +812,7 @@ class Database:
                 'auto_role': None,
                 'prefix': None
             }
+            self._mark_dirty('config', guild_id)
         return self.config_data[guild_id]
     
     def update_guild_config(self, guild_id, config):
@@ -314,3 +821,4 @@ class Database:
         current = self.get_guild_config(guild_id)
         current.update(config)
         self.config_data[guild_id] = current
+        self._mark_dirty('config', guild_id)
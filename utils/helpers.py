@@ -1,10 +1,16 @@
 import discord
 from discord.ext import commands
+import asyncio
 import datetime
 import json
+import logging
 import os
+import tempfile
+import threading
 from config.settings import BOT_CONFIG
 
+logger = logging.getLogger(__name__)
+
 def create_embed(title=None, description=None, color=None, footer=None):
     """Create a standard embed with bot branding"""
     if color is None:
@@ -105,29 +111,111 @@ def ensure_data_directory():
     if not os.path.exists('data'):
         os.makedirs('data')
 
+def backup_path(file_path, generation):
+    """Get the path of an older snapshot generation of a file"""
+    return f"{file_path}.{generation}"
+
 def load_json(file_path, default=None):
-    """Load JSON data from file"""
+    """Load JSON data from file, falling back to older generations if it is corrupt"""
     if default is None:
         default = {}
     
     ensure_data_directory()
     
-    if not os.path.exists(file_path):
+    candidates = [file_path]
+    generation = 1
+    while os.path.exists(backup_path(file_path, generation)):
+        candidates.append(backup_path(file_path, generation))
+        generation += 1
+    
+    if not any(os.path.exists(path) for path in candidates):
         save_json(file_path, default)
         return default
     
+    for path in candidates:
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError, UnicodeDecodeError):
+            logger.warning(f"Could not load {path}, trying an older generation")
+            continue
+        
+        if path != file_path:
+            logger.warning(f"Recovered {file_path} from {path}")
+        return data
+    
+    logger.error(f"No readable generation of {file_path}, starting from defaults")
+    return default
+
+def json_default(obj):
+    """Serialize objects that can convert themselves to plain data"""
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def _fsync_directory(directory):
+    """Flush a directory entry so a rename survives a crash"""
     try:
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        return default
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Serialises the generation rotation and final rename of concurrent writers of one file
+_save_locks = {}
+_save_locks_guard = threading.Lock()
 
-def save_json(file_path, data):
-    """Save JSON data to file"""
+def _save_lock(file_path):
+    with _save_locks_guard:
+        return _save_locks.setdefault(os.path.abspath(file_path), threading.Lock())
+
+def save_json(file_path, data, indent=2, generations=0):
+    """Atomically save JSON data to file, returning the number of bytes written
+    
+    The data is written to a temporary file, fsynced and renamed over the
+    target. With generations > 0 the previous snapshots are kept as
+    file.1 (newest) to file.N (oldest).
+    """
     ensure_data_directory()
     
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=2)
+    payload = json.dumps(data, indent=indent, default=json_default)
+    # A unique temp file per call, so overlapping saves never write into each other
+    fd, temp_path = tempfile.mkstemp(
+        dir=os.path.dirname(file_path) or '.',
+        prefix=f"{os.path.basename(file_path)}.",
+        suffix='.tmp'
+    )
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        with _save_lock(file_path):
+            if generations > 0 and os.path.exists(file_path):
+                for generation in range(generations - 1, 0, -1):
+                    older = backup_path(file_path, generation)
+                    if os.path.exists(older):
+                        os.replace(older, backup_path(file_path, generation + 1))
+                os.replace(file_path, backup_path(file_path, 1))
+            
+            os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(os.path.dirname(file_path))
+    
+    return len(payload)
+
+async def save_json_async(file_path, data, indent=2, generations=0):
+    """Save JSON data from a worker thread so the event loop keeps running"""
+    return await asyncio.to_thread(save_json, file_path, data, indent, generations)
 
 def get_user_mention(user_id):
     """Get a user mention string from user ID"""
@@ -0,0 +1,222 @@
+import asyncio
+import hashlib
+import io
+import os
+import re
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+try:
+    from PIL import Image, ImageSequence
+except ImportError:
+    # Pillow is optional; without it oversized images are rejected as before
+    Image = None
+
+# Leading bytes of the image formats Discord accepts for emojis
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'\xff\xd8\xff', 'jpeg')
+)
+
+def image_format(data):
+    """Get the format of image data from its signature, or None if unsupported"""
+    for signature, name in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return name
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+def emoji_name(filename):
+    """Turn a file name into a valid emoji name, or None if nothing usable is left"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    name = re.sub(r'[^A-Za-z0-9]', '', stem)[:32]
+    return name if len(name) >= 2 else None
+
+def check_emoji_image(filename, data, max_size):
+    """Validate image data for an emoji upload
+
+    Returns (name, animated); raises ValueError with a reason when the
+    file cannot be used. GIFs are counted as animated. With Pillow the
+    image structure is verified too; without it only the signature is
+    checked. Blocking, so run it in a worker thread.
+    """
+    name = emoji_name(filename)
+    if name is None:
+        raise ValueError("no usable name")
+    if len(data) > max_size:
+        raise ValueError(f"larger than {max_size // 1000} KB")
+
+    kind = image_format(data)
+    if kind is None:
+        raise ValueError("not a PNG, JPEG, GIF or WEBP image")
+    if Image is not None:
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image.verify()
+        except Exception:
+            # Truncated or corrupt; Pillow raises many types for these
+            raise ValueError("not a readable image")
+    return name, kind == 'gif'
+
+def read_archive(data, max_files, max_file_size, max_total_size):
+    """Read the files in a zip archive as (filename, bytes or error message) pairs
+
+    Entry sizes are checked before extracting so a compressed bomb never
+    gets inflated into memory, either by one entry or by all of them
+    together.
+    """
+    files = []
+    total_size = 0
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or info.filename.startswith('__MACOSX/') or os.path.basename(info.filename).startswith('.'):
+                continue
+            if len(files) >= max_files:
+                break
+            if info.file_size > max_file_size:
+                files.append((info.filename, f"larger than {max_file_size // 1000} KB"))
+                continue
+            if total_size + info.file_size > max_total_size:
+                files.append((info.filename, f"archive contents over {max_total_size // (1024 * 1024)} MB"))
+                continue
+            total_size += info.file_size
+            files.append((info.filename, archive.read(info)))
+    return files
+
+def _save_frames(frames, durations, loop, side, colors):
+    """Encode frames scaled to fit side x side as a GIF (animated) or PNG (static)"""
+    scaled = []
+    for frame in frames:
+        frame = frame.copy()
+        frame.thumbnail((side, side))
+        scaled.append(frame)
+
+    output = io.BytesIO()
+    if len(scaled) > 1:
+        paletted = [frame.convert('RGBA').quantize(colors) for frame in scaled]
+        paletted[0].save(
+            output, format='GIF', save_all=True, append_images=paletted[1:],
+            duration=durations, loop=loop, optimize=True, disposal=2
+        )
+    else:
+        frame = scaled[0]
+        if colors < 256:
+            frame = frame.convert('RGBA').quantize(colors)
+        frame.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+def shrink_image(data, max_size, max_side=128, max_frames=200, max_pixels=50_000_000):
+    """Downscale and recompress an image until it fits in max_size bytes
+
+    Runs in a worker process. Tries, in order: scaling down to max_side,
+    fewer colours, dropping every other animation frame and finally
+    smaller sizes. Frames are scaled down as they are decoded, and images
+    with more than max_frames frames or max_pixels decoded pixels in total
+    are refused, so memory and CPU stay bounded. Raises ValueError if
+    nothing fits.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        loop = image.info.get('loop', 0)
+        frames = []
+        durations = []
+        pixels = 0
+        for frame in ImageSequence.Iterator(image):
+            if len(frames) >= max_frames:
+                raise ValueError(f"more than {max_frames} frames")
+            pixels += frame.width * frame.height
+            if pixels > max_pixels:
+                raise ValueError("too large to process")
+            scaled = frame.convert('RGBA')
+            scaled.thumbnail((max_side, max_side))
+            frames.append(scaled)
+            durations.append(frame.info.get('duration', 100))
+
+    side = max_side
+    while side >= 16:
+        for colors in (256, 128, 64):
+            candidate_frames, candidate_durations = frames, durations
+            while True:
+                result = _save_frames(candidate_frames, candidate_durations, loop, side, colors)
+                if len(result) <= max_size:
+                    return result
+                if len(candidate_frames) <= 2:
+                    break
+                # Halve the frame rate, keeping the total animation length
+                candidate_durations = [a + b for a, b in zip(candidate_durations[::2], candidate_durations[1::2] + [0])]
+                candidate_frames = candidate_frames[::2]
+        side = side * 3 // 4
+    raise ValueError("could not shrink image enough")
+
+class ImageProcessor:
+    """Shrinks oversized emoji images in a process pool, caching by content hash
+
+    Processing is only available when Pillow is installed. Large GIFs are
+    handled in worker processes so the event loop never stalls, and the
+    same input image is only ever processed once per cache lifetime.
+    """
+
+    def __init__(self, max_workers=2, cache_size=128, max_side=128, max_frames=200, max_pixels=50_000_000):
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.max_side = max_side
+        self.max_frames = max_frames
+        self.max_pixels = max_pixels
+        self._pool = None
+        self._cache = OrderedDict()  # (sha256, max_size) -> bytes, or ValueError message
+
+    @property
+    def available(self):
+        return Image is not None
+
+    async def shrink(self, data, max_size):
+        """Get a version of image data that fits in max_size bytes"""
+        if len(data) <= max_size:
+            return data
+        if not self.available:
+            raise ValueError(f"larger than {max_size // 1000} KB")
+
+        key = (hashlib.sha256(data).hexdigest(), max_size)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            result = self._cache[key]
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            pool = self._pool
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(
+                    pool, shrink_image, data, max_size, self.max_side, self.max_frames, self.max_pixels
+                )
+            except BrokenProcessPool:
+                # A worker died, e.g. killed for running out of memory. Start a
+                # fresh pool next time and don't cache the failure, as this image
+                # may only have shared the pool with the one that broke it
+                if self._pool is pool:
+                    self._pool = None
+                    pool.shutdown(wait=False, cancel_futures=True)
+                raise ValueError("not a readable image")
+            except ValueError as e:
+                # Unshrinkable; remember that too
+                result = str(e)
+            except (OSError, Image.DecompressionBombError):
+                result = "not a readable image"
+
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        if isinstance(result, str):
+            raise ValueError(result)
+        return result
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
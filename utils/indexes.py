@@ -0,0 +1,277 @@
+from bisect import bisect_left, insort
+
+class OrderStatisticList:
+    """Sorted list with logarithmic insert, remove, rank and positional lookup
+
+    Values are kept in sorted buckets of roughly `load` items. A Fenwick tree
+    over the bucket sizes turns a position into a bucket (and back) in
+    O(log n), so fetching a page or a rank never scans the whole list.
+    """
+
+    def __init__(self, values=(), load=500):
+        self._load = load
+        self._lists = []
+        self._maxes = []
+        self._tree = []
+        self._size = 0
+
+        values = sorted(values)
+        for start in range(0, len(values), load):
+            bucket = values[start:start + load]
+            self._lists.append(bucket)
+            self._maxes.append(bucket[-1])
+        self._size = len(values)
+        self._rebuild_tree()
+
+    def __len__(self):
+        return self._size
+
+    def _rebuild_tree(self):
+        """Rebuild the Fenwick tree after buckets were split or removed"""
+        tree = [0] + [len(bucket) for bucket in self._lists]
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, bucket, delta):
+        i = bucket + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _tree_prefix(self, bucket):
+        """Number of values stored in buckets before the given one"""
+        total = 0
+        i = bucket
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _tree_locate(self, position):
+        """Find the bucket holding a position and the offset inside it"""
+        bucket = 0
+        step = 1 << (len(self._tree).bit_length() - 1)
+        while step:
+            nxt = bucket + step
+            if nxt < len(self._tree) and self._tree[nxt] <= position:
+                bucket = nxt
+                position -= self._tree[nxt]
+            step >>= 1
+        return bucket, position
+
+    def add(self, value):
+        """Insert a value"""
+        self._size += 1
+        if not self._lists:
+            self._lists.append([value])
+            self._maxes.append(value)
+            self._rebuild_tree()
+            return
+
+        bucket = bisect_left(self._maxes, value)
+        if bucket == len(self._maxes):
+            bucket -= 1
+            self._lists[bucket].append(value)
+            self._maxes[bucket] = value
+        else:
+            insort(self._lists[bucket], value)
+
+        items = self._lists[bucket]
+        if len(items) > 2 * self._load:
+            # Split oversized buckets to keep inserts cheap
+            tail = items[self._load:]
+            del items[self._load:]
+            self._maxes[bucket] = items[-1]
+            self._lists.insert(bucket + 1, tail)
+            self._maxes.insert(bucket + 1, tail[-1])
+            self._rebuild_tree()
+        else:
+            self._tree_add(bucket, 1)
+
+    def remove(self, value):
+        """Remove a value, raising ValueError if it is not present"""
+        bucket = bisect_left(self._maxes, value)
+        if bucket == len(self._maxes):
+            raise ValueError(f"{value!r} not in list")
+
+        items = self._lists[bucket]
+        offset = bisect_left(items, value)
+        if offset == len(items) or items[offset] != value:
+            raise ValueError(f"{value!r} not in list")
+
+        del items[offset]
+        self._size -= 1
+        if items:
+            self._maxes[bucket] = items[-1]
+            self._tree_add(bucket, -1)
+        else:
+            del self._lists[bucket]
+            del self._maxes[bucket]
+            self._rebuild_tree()
+
+    def index(self, value):
+        """Position of a value in sorted order"""
+        bucket = bisect_left(self._maxes, value)
+        if bucket == len(self._maxes):
+            raise ValueError(f"{value!r} not in list")
+
+        items = self._lists[bucket]
+        offset = bisect_left(items, value)
+        if offset == len(items) or items[offset] != value:
+            raise ValueError(f"{value!r} not in list")
+        return self._tree_prefix(bucket) + offset
+
+    def slice(self, start, stop):
+        """Get the values between two positions in sorted order"""
+        start = max(0, start)
+        stop = min(stop, self._size)
+        if start >= stop:
+            return []
+
+        bucket, offset = self._tree_locate(start)
+        result = []
+        remaining = stop - start
+        while remaining > 0:
+            chunk = self._lists[bucket][offset:offset + remaining]
+            result.extend(chunk)
+            remaining -= len(chunk)
+            bucket += 1
+            offset = 0
+        return result
+
+class BalanceIndex:
+    """Users ordered by balance (highest first) for leaderboard pages and ranks"""
+
+    def __init__(self, balances=()):
+        self._keys = {}
+        for user_id, balance in balances:
+            self._keys[user_id] = (-balance, user_id)
+        self._sorted = OrderStatisticList(self._keys.values())
+
+    def __len__(self):
+        return len(self._sorted)
+
+    def __contains__(self, user_id):
+        return user_id in self._keys
+
+    def balance_of(self, user_id):
+        """Get the indexed balance of a user, or None if they are not indexed"""
+        key = self._keys.get(user_id)
+        return None if key is None else -key[0]
+
+    def update(self, user_id, balance):
+        """Insert a user or move them to their new balance"""
+        key = (-balance, user_id)
+        old_key = self._keys.get(user_id)
+        if old_key == key:
+            return
+
+        if old_key is not None:
+            self._sorted.remove(old_key)
+        self._sorted.add(key)
+        self._keys[user_id] = key
+
+    def remove(self, user_id):
+        """Drop a user from the index"""
+        old_key = self._keys.pop(user_id, None)
+        if old_key is not None:
+            self._sorted.remove(old_key)
+
+    def page(self, start, count):
+        """Get (user_id, balance) pairs for positions start .. start + count"""
+        return [(user_id, -negative) for negative, user_id in self._sorted.slice(start, start + count)]
+
+    def rank(self, user_id):
+        """1-based leaderboard position of a user, or None if they are not ranked"""
+        key = self._keys.get(user_id)
+        if key is None:
+            return None
+        return self._sorted.index(key) + 1
+
+class GuildLeaderboards:
+    """Per-guild balance indexes covering only each guild's members
+
+    Membership comes from a MembershipIndex keyed by integer IDs, while
+    the indexes themselves use the database's string user IDs.
+    """
+
+    def __init__(self, members):
+        self.members = members
+        self._indexes = {}
+
+    def build(self, guild_id, balances):
+        """(Re)build a guild's index from its members' (user_id, balance) pairs"""
+        self._indexes[guild_id] = BalanceIndex(balances)
+
+    def drop(self, guild_id):
+        """Forget a guild's index"""
+        self._indexes.pop(guild_id, None)
+
+    def get(self, guild_id):
+        """Get a guild's index, or None if it has not been built"""
+        return self._indexes.get(guild_id)
+
+    def add_member(self, guild_id, user_id, balance):
+        index = self._indexes.get(guild_id)
+        if index is not None and balance is not None:
+            index.update(user_id, balance)
+
+    def remove_member(self, guild_id, user_id):
+        index = self._indexes.get(guild_id)
+        if index is not None:
+            index.remove(user_id)
+
+    def update(self, user_id, balance):
+        """Move a user in every guild they belong to; balance None removes them"""
+        for guild_id in self.members.guilds_of(int(user_id)):
+            index = self._indexes.get(guild_id)
+            if index is None:
+                continue
+            if balance is None:
+                index.remove(user_id)
+            else:
+                index.update(user_id, balance)
+
+class TicketIndex:
+    """Open modmail tickets indexed by (user, guild) and by ticket channel
+
+    Closed tickets are moved out of the open store into the archive, so
+    the index only ever holds open tickets and its size is the open count.
+    """
+
+    def __init__(self, tickets=()):
+        self._by_user = {}  # (user_id, guild_id) -> set of ticket_ids
+        self._by_channel = {}  # channel_id -> ticket_id
+        for ticket_id, ticket in tickets:
+            self.add(ticket_id, ticket)
+
+    def __len__(self):
+        return len(self._by_channel)
+
+    def add(self, ticket_id, ticket):
+        """Index an open ticket"""
+        self._by_user.setdefault((ticket['user_id'], ticket['guild_id']), set()).add(ticket_id)
+        self._by_channel[ticket['channel_id']] = ticket_id
+
+    def remove(self, ticket_id, ticket):
+        """Drop a ticket that was closed"""
+        key = (ticket['user_id'], ticket['guild_id'])
+        tickets = self._by_user.get(key)
+        if tickets is not None:
+            tickets.discard(ticket_id)
+            if not tickets:
+                del self._by_user[key]
+
+        if self._by_channel.get(ticket['channel_id']) == ticket_id:
+            del self._by_channel[ticket['channel_id']]
+
+    def user_tickets(self, user_id, guild_id):
+        """Get the IDs of a user's open tickets in a guild"""
+        return self._by_user.get((user_id, guild_id), frozenset())
+
+    def by_channel(self, channel_id):
+        """Get the ID of the open ticket using a channel, or None"""
+        return self._by_channel.get(channel_id)
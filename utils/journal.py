@@ -0,0 +1,132 @@
+import asyncio
+import json
+import os
+import threading
+from config.settings import STORAGE_CONFIG
+from utils.helpers import json_default
+
+# Pseudo-store under which ledger transactions are journaled, keyed by transaction ID
+TRANSACTIONS = 'transactions'
+
+class Journal:
+    """Append-only log of changed records, replayed on top of the last snapshot
+
+    Each entry holds the latest value of one record (or a deletion marker), so
+    replaying the log is idempotent. Changes are grouped and fsynced together
+    every commit_interval milliseconds, one line per group, so a torn write
+    loses a whole group and never half of one. Ledger transactions are
+    journaled in the same groups as the balance changes they record.
+    """
+
+    def __init__(self, path=None, commit_interval=None):
+        self.path = path or STORAGE_CONFIG['journal_path']
+        self.commit_interval = commit_interval or STORAGE_CONFIG['journal_commit_ms']
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._pending = {}  # (store, key) -> latest record, None once deleted
+        self._transactions = []  # ledger rows posted since the last group
+        self._queue = []  # serialized lines waiting to be written, in order
+        self._lock = threading.Lock()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def replay(self):
+        """Yield (store, key, value) for every committed entry; value is None for deletions"""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write from a crash, nothing after it was committed
+                    break
+                # Journals written before group lines hold one entry per line
+                for item in entry.get('g', (entry,)):
+                    yield item['s'], item['k'], item.get('v')
+
+    def record(self, store, key, value):
+        """Queue a record for the next group commit; value is None for deletions"""
+        self._pending[(store, key)] = value
+
+    def record_transaction(self, row):
+        """Queue a ledger row for the next group commit"""
+        self._transactions.append(row)
+
+    def has_pending(self):
+        """Check whether anything is waiting for the next group commit"""
+        return bool(self._pending or self._transactions)
+
+    def _enqueue_pending(self):
+        """Serialize queued records and ledger rows into a journal line awaiting a write"""
+        entries = []
+        for (store, key), value in self._pending.items():
+            entry = {'s': store, 'k': key}
+            if value is not None:
+                entry['v'] = value
+            entries.append(entry)
+        for row in self._transactions:
+            entries.append({'s': TRANSACTIONS, 'k': str(row[0]), 'v': row})
+        line = json.dumps({'g': entries}, default=json_default) + '\n'
+
+        self._pending.clear()
+        self._transactions = []
+        with self._lock:
+            self._queue.append(line)
+
+    def _drain(self):
+        """Append every serialized line to the journal and fsync it"""
+        with self._lock:
+            if not self._queue or self._file.closed:
+                return
+
+            self._file.writelines(self._queue)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._queue.clear()
+
+    def commit(self):
+        """Synchronously write and fsync every queued record"""
+        if self.has_pending():
+            self._enqueue_pending()
+        self._drain()
+
+    async def run(self):
+        """Group-commit queued records every commit interval"""
+        while True:
+            await asyncio.sleep(self.commit_interval / 1000)
+            if self.has_pending():
+                self._enqueue_pending()
+                await asyncio.to_thread(self._drain)
+
+    def checkpoint(self):
+        """Commit everything recorded so far and return its end offset in the journal"""
+        self.commit()
+        with self._lock:
+            return self._file.tell()
+
+    def compact(self, offset):
+        """Drop entries before offset once a snapshot containing them has been written"""
+        with self._lock:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                f.seek(offset)
+                tail = f.read()
+
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._file.close()
+            os.replace(temp_path, self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        """Commit queued records and close the journal file"""
+        self.commit()
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from config.settings import STORAGE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Accounts that are not users; user accounts are their ID strings
+SYSTEM_ACCOUNT = 'system'  # money created or destroyed by the bot (rewards, adjustments)
+HOUSE_ACCOUNT = 'house'  # gambling counterparty
+SHOP_ACCOUNT = 'shop'  # purchases and sales
+ADMIN_ACCOUNT = 'admin'  # eco give/take
+
+class Ledger:
+    """Append-only double-entry ledger of economy transactions
+
+    Every transaction moves an amount from one account to another, so the
+    balance of any account is the sum of what it received minus what it
+    sent. Transactions are buffered in memory and inserted in batches.
+    When a journal is given, each transaction is also recorded in it, so it
+    is committed together with the balance change it pays for and can be
+    recovered if the bot stops before the batch is inserted.
+    """
+
+    def __init__(self, path=None, flush_interval=None, journal=None):
+        self.path = path or STORAGE_CONFIG['ledger_path']
+        self.flush_interval = flush_interval or STORAGE_CONFIG['ledger_flush_ms']
+        self.journal = journal
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS transactions ('
+                'id INTEGER PRIMARY KEY, ts REAL NOT NULL, type TEXT NOT NULL, '
+                'src TEXT NOT NULL, dst TEXT NOT NULL, amount INTEGER NOT NULL)'
+            )
+            self.conn.execute('CREATE INDEX IF NOT EXISTS transactions_src ON transactions (src, id)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS transactions_dst ON transactions (dst, id)')
+
+        last_id = self.conn.execute('SELECT MAX(id) FROM transactions').fetchone()[0]
+        self._next_id = (last_id or 0) + 1
+        self._buffer = []
+
+    @property
+    def next_id(self):
+        """ID the next posted transaction will get"""
+        return self._next_id
+
+    def post(self, tx_type, src, dst, amount):
+        """Record a transfer of amount from src to dst and return its ID"""
+        tx_id = self._next_id
+        self._next_id += 1
+        row = (tx_id, time.time(), tx_type, str(src), str(dst), int(amount))
+        self._buffer.append(row)
+        if self.journal:
+            self.journal.record_transaction(row)
+        return tx_id
+
+    def _write_buffer(self):
+        """Insert every buffered transaction
+
+        The buffer is taken under the write lock, so once this returns no
+        earlier batch is still being inserted by another thread.
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        'INSERT INTO transactions (id, ts, type, src, dst, amount) VALUES (?, ?, ?, ?, ?, ?)',
+                        rows
+                    )
+            except Exception:
+                # Put the rows back in front of newer ones
+                self._buffer[:0] = rows
+                raise
+
+    def flush(self):
+        """Synchronously write buffered transactions"""
+        self._write_buffer()
+
+    async def run(self):
+        """Write buffered transactions in batches every flush interval"""
+        while True:
+            await asyncio.sleep(self.flush_interval / 1000)
+            if self._buffer:
+                try:
+                    await asyncio.to_thread(self._write_buffer)
+                except Exception as e:
+                    logger.error(f"Ledger flush failed, retrying {len(self._buffer)} transactions: {e}")
+
+    def recover(self, rows):
+        """Insert journaled transactions that were lost from the buffer when the bot stopped"""
+        rows = [tuple(row) for row in rows]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO transactions (id, ts, type, src, dst, amount) VALUES (?, ?, ?, ?, ?, ?)',
+                rows
+            )
+        self._next_id = max(self._next_id, max(row[0] for row in rows) + 1)
+
+    def accounts(self):
+        """Get every account that appears in at least one transaction"""
+        self.flush()
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT src FROM transactions UNION SELECT dst FROM transactions'
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def history(self, account, before=None, limit=10):
+        """Get an account's transactions newest first, older than the `before` ID cursor"""
+        self.flush()
+        cursor = before if before is not None else self._next_id
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT id, ts, type, src, dst, amount FROM ('
+                'SELECT * FROM transactions WHERE src = ? AND id < ? '
+                'UNION ALL '
+                'SELECT * FROM transactions WHERE dst = ? AND id < ? AND src != dst'
+                ') ORDER BY id DESC LIMIT ?',
+                (str(account), cursor, str(account), cursor, limit)
+            ).fetchall()
+
+        return [
+            {'id': row[0], 'ts': row[1], 'type': row[2], 'src': row[3], 'dst': row[4], 'amount': row[5]}
+            for row in rows
+        ]
+
+    def balances(self):
+        """Derive every account's balance from the full ledger"""
+        self.flush()
+        return self.written_balances()
+
+    def written_balances(self, before=None):
+        """Derive balances from the transactions already written, without flushing
+
+        Only transactions with an ID below before are counted, so a caller
+        that flushed and noted next_id gets balances as of that moment. Safe
+        to call from a worker thread while the event loop keeps posting.
+        """
+        before = self._next_id if before is None else before
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT account, SUM(delta) FROM ('
+                'SELECT dst AS account, amount AS delta FROM transactions WHERE id < ? '
+                'UNION ALL '
+                'SELECT src AS account, -amount AS delta FROM transactions WHERE id < ?'
+                ') GROUP BY account',
+                (before, before)
+            ).fetchall()
+        return dict(rows)
+
+    def balance(self, account):
+        """Derive one account's balance from the ledger"""
+        self.flush()
+        with self._lock:
+            received, sent = self.conn.execute(
+                'SELECT '
+                '(SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE dst = ?), '
+                '(SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE src = ?)',
+                (str(account), str(account))
+            ).fetchone()
+        return received - sent
+
+    def close(self):
+        """Write buffered transactions and close the ledger"""
+        self.flush()
+        with self._lock:
+            self.conn.close()
+
+def verify_balances(derived, balances):
+    """Compare stored (user_id, balance) pairs with ledger balances; returns {user_id: (stored, derived)} mismatches"""
+    mismatches = {}
+    for user_id, balance in balances:
+        expected = derived.get(user_id, 0)
+        if balance != expected:
+            mismatches[user_id] = (balance, expected)
+    return mismatches
+
+if __name__ == '__main__':
+    # Usage: python -m utils.ledger verify
+    if len(sys.argv) < 2 or sys.argv[1] != 'verify':
+        print("Usage: python -m utils.ledger verify")
+        sys.exit(1)
+
+    from utils.journal import TRANSACTIONS, Journal
+    from utils.storage import get_backend
+
+    backend = get_backend()
+    ledger = Ledger()
+    users = backend.load('users')
+    derived = ledger.balances()
+
+    # Include changes not yet in the snapshot, and transactions the bot has
+    # journaled but not inserted yet
+    journal = Journal()
+    for store, key, value in journal.replay():
+        if store == TRANSACTIONS:
+            tx_id, _, _, src, dst, amount = value
+            if tx_id >= ledger.next_id:
+                derived[src] = derived.get(src, 0) - amount
+                derived[dst] = derived.get(dst, 0) + amount
+        elif store == 'users':
+            if value is None:
+                users.pop(key, None)
+            else:
+                users[key] = value
+    journal.close()
+    mismatches = verify_balances(derived, ((user_id, user.get('balance', 0)) for user_id, user in users.items()))
+    ledger.close()
+    backend.close()
+
+    for user_id, (stored, expected) in mismatches.items():
+        print(f"{user_id}: stored ${stored:,}, ledger ${expected:,}")
+    print(f"Checked {len(users)} users, {len(mismatches)} mismatched")
+    sys.exit(1 if mismatches else 0)
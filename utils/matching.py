@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import re
+import sys
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+MATCH_MODES = ('contains', 'word', 'startswith', 'exact', 'regex')
+
+class TriggerMatcher:
+    """Aho-Corasick automaton finding which of many triggers occurs in a text
+
+    Triggers are given in priority order. A search walks the text once and
+    returns the highest-priority trigger found anywhere in it, so the cost
+    depends on the message length rather than the number of triggers. With
+    whole_word, a trigger only counts when it is not part of a longer word.
+    """
+
+    def __init__(self, triggers, whole_word=False):
+        self.triggers = list(triggers)
+        self.whole_word = whole_word
+        self._goto = [{}]  # node -> {char: node}
+        self._fail = [0]
+        self._output = [None]  # node -> priority of the trigger ending exactly here
+        self._link = [0]  # node -> nearest suffix node that ends a trigger
+        self._best = [None]  # node -> best trigger priority ending here or at a suffix
+
+        for priority, trigger in enumerate(self.triggers):
+            node = 0
+            for char in trigger:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(None)
+                    self._link.append(0)
+                    self._best.append(None)
+                node = nxt
+            if self._output[node] is None:
+                self._output[node] = priority
+                self._best[node] = priority
+
+        # Breadth-first so every fail target is finished before its dependants
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                suffix = self._fail[child]
+                self._link[child] = suffix if self._output[suffix] is not None else self._link[suffix]
+
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+                queue.append(child)
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def search(self, text):
+        """Get the highest-priority trigger contained in text, or None"""
+        if self.whole_word:
+            return self._search_words(text)
+
+        goto = self._goto
+        fail = self._fail
+        best_at = self._best
+        best = None
+        node = 0
+
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            found = best_at[node]
+            if found is not None and (best is None or found < best):
+                best = found
+                if best == 0:
+                    break
+
+        return None if best is None else self.triggers[best]
+
+    def _search_words(self, text):
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        link = self._link
+        best = None
+        node = 0
+
+        for end, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            # Follow only the suffixes that end a trigger
+            found = node if output[node] is not None else link[node]
+            while found:
+                priority = output[found]
+                if best is None or priority < best:
+                    start = end - len(self.triggers[priority]) + 1
+                    if not _is_word_char(text, start - 1) and not _is_word_char(text, end + 1):
+                        best = priority
+                found = link[found]
+            if best == 0:
+                break
+
+        return None if best is None else self.triggers[best]
+
+    def search_prefix(self, text):
+        """Get the highest-priority trigger that text starts with, or None"""
+        best = None
+        node = 0
+        for char in text:
+            node = self._goto[node].get(char)
+            if node is None:
+                break
+            found = self._output[node]
+            if found is not None and (best is None or found < best):
+                best = found
+        return None if best is None else self.triggers[best]
+
+def _is_word_char(text, index):
+    if index < 0 or index >= len(text):
+        return False
+    char = text[index]
+    return char.isalnum() or char == '_'
+
+class AutoresponseMatcher:
+    """All of a guild's autoresponse triggers compiled into one matcher
+
+    Each match mode gets its own structure and the earliest-added matching
+    trigger wins across all of them. Regex patterns run last and only when
+    they could still beat the best plain match. Python's re cannot be
+    interrupted, so patterns only see the first max_input characters of a
+    message, which bounds how long one search can take, and a pattern that
+    overruns the time budget even once is dropped and reported in
+    over_budget for the caller to disable. Runs are timed in thread CPU
+    time, so waiting for the GIL or a stall elsewhere in the process is not
+    counted against a pattern.
+    """
+
+    def __init__(self, autoresponses, time_budget=None, max_input=None):
+        self.time_budget = time_budget
+        self.max_input = max_input
+        self.over_budget = []
+        self._priority = {}
+        triggers = {mode: [] for mode in MATCH_MODES}
+        self._regexes = []
+
+        for key, data in autoresponses.items():
+            if data.get('disabled'):
+                continue
+            self._priority[key] = len(self._priority)
+            mode = data.get('mode', 'contains')
+            if mode == 'regex':
+                self._regexes.append((key, re.compile(data.get('pattern', key), re.IGNORECASE)))
+            else:
+                triggers[mode].append(key)
+
+        self._contains = TriggerMatcher(triggers['contains'])
+        self._words = TriggerMatcher(triggers['word'], whole_word=True)
+        self._prefixes = TriggerMatcher(triggers['startswith'])
+        self._exact = set(triggers['exact'])
+
+    def search(self, message_content):
+        """Get the key of the autoresponse a message triggers, or None"""
+        text = message_content.lower()
+        candidates = []
+        if self._contains:
+            candidates.append(self._contains.search(text))
+        if self._words:
+            candidates.append(self._words.search(text))
+        if self._prefixes:
+            candidates.append(self._prefixes.search_prefix(text.lstrip()))
+        if text.strip() in self._exact:
+            candidates.append(text.strip())
+        best = min(
+            (key for key in candidates if key is not None),
+            key=self._priority.__getitem__,
+            default=None
+        )
+
+        subject = message_content if self.max_input is None else message_content[:self.max_input]
+        for key, pattern in list(self._regexes):
+            if best is not None and self._priority[key] > self._priority[best]:
+                break
+            start = time.thread_time()
+            matched = pattern.search(subject)
+            elapsed = time.thread_time() - start
+            if self.time_budget is not None and elapsed > self.time_budget:
+                logger.warning(f"Autoresponse regex {pattern.pattern!r} took {elapsed * 1000:.1f}ms, dropping it")
+                self._regexes.remove((key, pattern))
+                self.over_budget.append(key)
+                continue
+            if matched:
+                best = key
+                break
+
+        return best
+
+def _regex_probes(length):
+    """Inputs that make backtracking patterns like (a+)+$ or a*a*a*b explode"""
+    return [char * (length - 1) + '!' for char in 'a1 .-'] + [('ab' * length)[:length - 1] + '!']
+
+_PROBE_SCRIPT = """
+import re, sys, time
+pattern = re.compile(sys.argv[1], re.IGNORECASE)
+budget = float(sys.argv[2])
+for probe in sys.argv[3:]:
+    start = time.perf_counter()
+    pattern.search(probe)
+    if time.perf_counter() - start > budget:
+        sys.exit(1)
+"""
+
+async def check_regex(pattern, time_budget, max_input=40, timeout=2):
+    """Validate a regex trigger; returns an error message or None
+
+    The pattern is run against backtracking probes as long as the input it
+    will be given, in a separate process that is killed if it hangs, so a
+    pathological pattern never blocks the bot.
+    """
+    try:
+        re.compile(pattern)
+    except re.error as e:
+        return f"Invalid regex: {e}"
+
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, '-c', _PROBE_SCRIPT, pattern, str(time_budget), *_regex_probes(max_input),
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL
+    )
+    try:
+        code = await asyncio.wait_for(process.wait(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        code = 1
+
+    if code != 0:
+        return "Pattern is too slow on some inputs (catastrophic backtracking)"
+    return None
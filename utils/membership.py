@@ -0,0 +1,48 @@
+class MembershipIndex:
+    """Two-way map between guilds and the members the bot can see in them"""
+
+    def __init__(self):
+        self._guilds_of = {}  # user_id -> set of guild_ids
+        self._members_of = {}  # guild_id -> set of user_ids
+
+    def add(self, guild_id, user_id):
+        """Record that a user is a member of a guild"""
+        self._members_of.setdefault(guild_id, set()).add(user_id)
+        self._guilds_of.setdefault(user_id, set()).add(guild_id)
+
+    def remove(self, guild_id, user_id):
+        """Record that a user left a guild"""
+        members = self._members_of.get(guild_id)
+        if members is not None:
+            members.discard(user_id)
+
+        guilds = self._guilds_of.get(user_id)
+        if guilds is not None:
+            guilds.discard(guild_id)
+            if not guilds:
+                del self._guilds_of[user_id]
+
+    def add_guild(self, guild_id, user_ids):
+        """Record every member of a guild at once"""
+        for user_id in user_ids:
+            self.add(guild_id, user_id)
+
+    def remove_guild(self, guild_id):
+        """Forget a guild the bot is no longer in"""
+        for user_id in self._members_of.pop(guild_id, ()):
+            guilds = self._guilds_of.get(user_id)
+            if guilds is not None:
+                guilds.discard(guild_id)
+                if not guilds:
+                    del self._guilds_of[user_id]
+
+    def guilds_of(self, user_id):
+        """Get the IDs of the guilds a user shares with the bot"""
+        return self._guilds_of.get(user_id, frozenset())
+
+    def members_of(self, guild_id):
+        """Get the IDs of the members of a guild"""
+        return self._members_of.get(guild_id, frozenset())
+
+    def is_member(self, guild_id, user_id):
+        return guild_id in self._guilds_of.get(user_id, ())
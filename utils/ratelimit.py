@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+from discord.ext import commands
+
+class RateLimiter:
+    """Token buckets per key that allow `rate` hits every `per` seconds
+
+    A bucket that has been idle for `per` seconds is full again and so is
+    indistinguishable from a new one. Buckets are kept in last-use order,
+    which lets every call drop such idle buckets from the front in O(1)
+    amortized time, and max_keys caps memory when many keys are active.
+    """
+
+    def __init__(self, rate, per, max_keys=100000):
+        self.rate = rate
+        self.per = per
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, last update)
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def _prune(self, now):
+        buckets = self._buckets
+        while buckets:
+            key, (_, last) = next(iter(buckets.items()))
+            if now - last < self.per and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+    def _tokens(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.rate
+        tokens, last = bucket
+        return min(self.rate, tokens + (now - last) * self.rate / self.per)
+
+    def retry_after(self, key, now=None):
+        """Seconds until key may hit again without using a token; 0 if it may now"""
+        now = time.monotonic() if now is None else now
+        tokens = self._tokens(key, now)
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) * self.per / self.rate
+
+    def hit(self, key, now=None):
+        """Use a token for key; returns 0 if allowed, else seconds to wait"""
+        now = time.monotonic() if now is None else now
+        tokens = self._tokens(key, now)
+        if tokens < 1:
+            return (1 - tokens) * self.per / self.rate
+
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        self._prune(now)
+        return 0.0
+
+    def reset(self, key):
+        """Forget a key's usage"""
+        self._buckets.pop(key, None)
+
+def cooldown(rate, per, scope=commands.BucketType.user):
+    """Command check limiting uses per scope, raising CommandOnCooldown like commands.cooldown"""
+    limiter = RateLimiter(rate, per)
+    template = commands.Cooldown(rate, per)
+
+    async def predicate(ctx):
+        retry_after = limiter.hit(scope.get_key(ctx.message))
+        if retry_after:
+            raise commands.CommandOnCooldown(template, retry_after, scope)
+        return True
+
+    return commands.check(predicate)
@@ -0,0 +1,117 @@
+import time
+from datetime import datetime, timezone
+
+class UserRecord:
+    """Compact per-user economy record with dict-style access
+
+    Fields live in __slots__ instead of a per-user dict, timestamps are
+    epoch seconds and the warnings/inventory/active_perks collections are
+    only created when something is first stored in them.
+    """
+
+    FIELDS = ('balance', 'last_daily', 'last_work', 'total_earned', 'total_spent', 'created_at')
+    COLLECTIONS = {'warnings': list, 'inventory': dict, 'active_perks': dict}
+
+    __slots__ = FIELDS + ('_warnings', '_inventory', '_active_perks', '_extra')
+
+    def __init__(self, balance=0, last_daily=0, last_work=0, total_earned=0, total_spent=0, created_at=None):
+        self.balance = balance
+        self.last_daily = last_daily
+        self.last_work = last_work
+        self.total_earned = total_earned
+        self.total_spent = total_spent
+        self.created_at = time.time() if created_at is None else created_at
+        self._warnings = None
+        self._inventory = None
+        self._active_perks = None
+        self._extra = None  # any keys outside the known schema
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from its stored dict form"""
+        created_at = data.get('created_at')
+        if isinstance(created_at, str):
+            # Older records stored naive UTC ISO strings
+            created_at = datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp()
+
+        record = cls(
+            balance=data.get('balance', 0),
+            last_daily=data.get('last_daily', 0),
+            last_work=data.get('last_work', 0),
+            total_earned=data.get('total_earned', 0),
+            total_spent=data.get('total_spent', 0),
+            created_at=created_at
+        )
+
+        for key, value in data.items():
+            if key in cls.COLLECTIONS:
+                if value:
+                    setattr(record, f'_{key}', value)
+            elif key not in cls.FIELDS:
+                record[key] = value
+
+        return record
+
+    def to_dict(self):
+        """Convert the record to plain data for storage"""
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        for key in self.COLLECTIONS:
+            value = getattr(self, f'_{key}')
+            if value:
+                data[key] = value
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if key in self.COLLECTIONS:
+            value = getattr(self, f'_{key}')
+            if value is None:
+                value = self.COLLECTIONS[key]()
+                setattr(self, f'_{key}', value)
+            return value
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif key in self.COLLECTIONS:
+            setattr(self, f'_{key}', value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.FIELDS or key in self.COLLECTIONS or bool(self._extra and key in self._extra)
+
+    def get(self, key, default=None):
+        """Get a value without creating empty collections"""
+        if key in self.COLLECTIONS:
+            value = getattr(self, f'_{key}')
+            return default if value is None else value
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, data):
+        """Set several values at once, like dict.update"""
+        for key, value in dict(data).items():
+            self[key] = value
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __repr__(self):
+        return f"UserRecord({self.to_dict()!r})"
@@ -0,0 +1,64 @@
+import time
+
+HOUR = 3600
+DAY = 86400
+
+class UsageRollup:
+    """Usage counts kept in hourly buckets, downsampled to daily ones as they age
+
+    Buckets live in plain dicts keyed by the bucket's start time as a string
+    so they can be stored as JSON next to the rest of an entry. Recent hours
+    keep hourly resolution, older ones are merged into days, and days past
+    the retention period are dropped, so each entry stays a bounded size.
+    """
+
+    def __init__(self, hourly_hours=48, daily_days=90):
+        self.hourly_window = hourly_hours * HOUR
+        self.retention = daily_days * DAY
+
+    def record(self, entry, count, at=None, now=None):
+        """Add count uses to the hour containing at, by default the current one"""
+        now = time.time() if now is None else now
+        at = now if at is None else at
+        hourly = entry.setdefault('hourly', {})
+        hour = str(int(at) - int(at) % HOUR)
+        hourly[hour] = hourly.get(hour, 0) + count
+        self.downsample(entry, now)
+
+    def downsample(self, entry, now=None):
+        """Merge hours older than the hourly window into days and drop expired days"""
+        now = time.time() if now is None else now
+        hourly = entry.get('hourly')
+        daily = entry.get('daily')
+
+        if hourly:
+            cutoff = now - self.hourly_window
+            for hour in [hour for hour in hourly if int(hour) + HOUR <= cutoff]:
+                day = int(hour) - int(hour) % DAY
+                if daily is None:
+                    daily = entry['daily'] = {}
+                daily[str(day)] = daily.get(str(day), 0) + hourly.pop(hour)
+
+        if daily:
+            cutoff = now - self.retention
+            for day in [day for day in daily if int(day) + DAY <= cutoff]:
+                del daily[day]
+
+    def uses_since(self, entry, since):
+        """Uses from since until now; a bucket straddling since counts pro rata"""
+        total = 0
+        for buckets, width in ((entry.get('hourly'), HOUR), (entry.get('daily'), DAY)):
+            if not buckets:
+                continue
+            for start, count in buckets.items():
+                end = int(start) + width
+                if end > since:
+                    total += count * min(1, (end - since) / width)
+        return total
+
+    def trend(self, entry, period, now=None):
+        """(uses in the last period, uses in the period before it), rounded"""
+        now = time.time() if now is None else now
+        recent = self.uses_since(entry, now - period)
+        previous = self.uses_since(entry, now - 2 * period) - recent
+        return round(recent), round(previous)
@@ -0,0 +1,304 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+from config.settings import DATA_PATHS, STORAGE_CONFIG
+from utils.helpers import json_default, load_json, save_json, save_json_async
+
+# Stores managed by Database, each one a flat mapping of key -> record
+STORES = ('users', 'modmail', 'modmail_archive', 'autoresponse', 'config')
+
+class StorageBackend:
+    """Base class for the persistent stores behind Database"""
+
+    # Whether single records can be fetched without loading the whole store
+    supports_lazy_loading = False
+
+    def load(self, store):
+        """Load every record of a store as a dict"""
+        raise NotImplementedError
+
+    def get(self, store, key):
+        """Load a single record, or None if it does not exist"""
+        raise NotImplementedError
+
+    def save(self, store, data, changed_keys, deleted_keys=()):
+        """Persist the changed keys of a store and return the bytes written
+
+        Only keys in deleted_keys are removed; a changed key missing from
+        data is left as it is.
+        """
+        raise NotImplementedError
+
+    def field_items(self, store, field, default=None):
+        """Get (key, value of one field) pairs for every record of a store"""
+        return [(key, record.get(field, default)) for key, record in self.load(store).items()]
+
+    async def save_async(self, store, data, changed_keys, deleted_keys=()):
+        """Persist the changed keys of a store from a worker thread"""
+        return await asyncio.to_thread(self.save, store, data, changed_keys, deleted_keys)
+
+    def close(self):
+        """Release any resources held by the backend"""
+        pass
+
+class JSONBackend(StorageBackend):
+    """Stores each table as a whole JSON file under data/"""
+
+    def load(self, store):
+        return load_json(DATA_PATHS[store], {})
+
+    def save(self, store, data, changed_keys, deleted_keys=()):
+        return save_json(
+            DATA_PATHS[store], data,
+            indent=STORAGE_CONFIG['json_indent'],
+            generations=STORAGE_CONFIG['snapshot_generations']
+        )
+
+    async def save_async(self, store, data, changed_keys, deleted_keys=()):
+        return await save_json_async(
+            DATA_PATHS[store], data,
+            indent=STORAGE_CONFIG['json_indent'],
+            generations=STORAGE_CONFIG['snapshot_generations']
+        )
+
+class SQLiteBackend(StorageBackend):
+    """Stores each table as key/value rows in a single SQLite database"""
+
+    supports_lazy_loading = True
+
+    def __init__(self, path=None):
+        self.path = path or STORAGE_CONFIG['sqlite_path']
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+        with self.conn:
+            for store in STORES:
+                self.conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS {store} ('
+                    'key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+                )
+
+    def load(self, store):
+        with self._lock:
+            rows = self.conn.execute(f'SELECT key, value FROM {store}').fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    def get(self, store, key):
+        with self._lock:
+            row = self.conn.execute(f'SELECT value FROM {store} WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def field_items(self, store, field, default=None):
+        # Extracted by SQLite, so no record is parsed in Python
+        with self._lock:
+            rows = self.conn.execute(
+                f'SELECT key, json_extract(value, ?) FROM {store}', (f'$.{field}',)
+            ).fetchall()
+        return [(key, default if value is None else value) for key, value in rows]
+
+    def save(self, store, data, changed_keys, deleted_keys=()):
+        upserts = []
+        deletes = [(key,) for key in deleted_keys]
+        written = 0
+        for key in changed_keys:
+            if key in data and key not in deleted_keys:
+                value = json.dumps(data[key], default=json_default)
+                upserts.append((key, value))
+                written += len(key) + len(value)
+
+        if not upserts and not deletes:
+            return 0
+
+        with self._lock, self.conn:
+            if upserts:
+                self.conn.executemany(
+                    f'INSERT INTO {store} (key, value) VALUES (?, ?) '
+                    'ON CONFLICT(key) DO UPDATE SET value = excluded.value',
+                    upserts
+                )
+            if deletes:
+                self.conn.executemany(f'DELETE FROM {store} WHERE key = ?', deletes)
+
+        return written
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+class LazyStore:
+    """Bounded LRU view of a backend store that loads records on first access
+
+    Only the working set is kept in memory. When a record is evicted,
+    on_evict is called so the owner can write it back if it has changes.
+    Removed records are tombstoned until a save deletes them from the
+    backend, so a record that is merely not cached is never deleted.
+    """
+
+    def __init__(self, backend, store, max_size, decode=None, on_evict=None):
+        self.backend = backend
+        self.store = store
+        self.max_size = max_size
+        self.decode = decode or (lambda value: value)
+        self.on_evict = on_evict
+        self._records = OrderedDict()
+        self._tombstones = set()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _insert(self, key, value):
+        """Cache a record as most recently used and evict past the size limit"""
+        self._tombstones.discard(key)
+        self._records[key] = value
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_size:
+            evicted_key, evicted_value = self._records.popitem(last=False)
+            self.stats['evictions'] += 1
+            if self.on_evict:
+                self.on_evict(evicted_key, evicted_value)
+
+    def get(self, key, default=None):
+        if key in self._records:
+            self.stats['hits'] += 1
+            self._records.move_to_end(key)
+            return self._records[key]
+
+        if key in self._tombstones:
+            return default
+
+        self.stats['misses'] += 1
+        value = self.backend.get(self.store, key)
+        if value is None:
+            return default
+
+        value = self.decode(value)
+        self._insert(key, value)
+        return value
+
+    def peek(self, key):
+        """Get a cached record without loading it or touching its LRU position"""
+        return self._records.get(key)
+
+    def snapshot(self, keys):
+        """Get the records and the tombstoned keys among keys, for handing to a save"""
+        records = {}
+        deleted = set()
+        for key in keys:
+            if key in self._records:
+                records[key] = self._records[key]
+            elif key in self._tombstones:
+                deleted.add(key)
+            else:
+                # Evicted since it changed and written back, so the backend has it
+                value = self.backend.get(self.store, key)
+                if value is not None:
+                    records[key] = value
+        return records, deleted
+
+    def forget_deleted(self, keys):
+        """Drop the tombstones of keys a save has deleted from the backend"""
+        self._tombstones -= keys
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._insert(key, value)
+
+    def __delitem__(self, key):
+        if self.pop(key) is None:
+            raise KeyError(key)
+
+    def pop(self, key, default=None):
+        value = self._records.pop(key, None)
+        if value is None and key not in self._tombstones:
+            stored = self.backend.get(self.store, key)
+            if stored is not None:
+                value = self.decode(stored)
+        if value is None:
+            return default
+
+        # Deleted from the backend by the next save of this key
+        self._tombstones.add(key)
+        return value
+
+    def items(self):
+        """Iterate every record, cached or not, without caching the cold ones"""
+        yield from list(self._records.items())
+        for key, value in self.backend.load(self.store).items():
+            if key not in self._records and key not in self._tombstones:
+                yield key, self.decode(value)
+
+    def field_items(self, field, default=None):
+        """Get (key, field value) pairs for every record without decoding cold ones"""
+        cached = {key: value.get(field, default) for key, value in self._records.items()}
+        yield from cached.items()
+        for key, value in self.backend.field_items(self.store, field, default):
+            if key not in cached and key not in self._tombstones:
+                yield key, value
+
+    def keys(self):
+        for key, _ in self.items():
+            yield key
+
+    def values(self):
+        for _, value in self.items():
+            yield value
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        """Number of records currently held in memory"""
+        return len(self._records)
+
+def get_backend():
+    """Create the storage backend selected in STORAGE_CONFIG"""
+    backend = STORAGE_CONFIG['backend'].lower()
+    if backend == 'sqlite':
+        return SQLiteBackend()
+    if backend == 'json':
+        return JSONBackend()
+    raise ValueError(f"Unknown storage backend: {STORAGE_CONFIG['backend']}")
+
+def migrate_json_to_sqlite(sqlite_path=None):
+    """Copy every record from the data/*.json files into SQLite"""
+    backend = SQLiteBackend(sqlite_path)
+    counts = {}
+    try:
+        for store in STORES:
+            if not os.path.exists(DATA_PATHS[store]):
+                counts[store] = 0
+                continue
+
+            data = load_json(DATA_PATHS[store], {})
+            backend.save(store, data, data.keys())
+            counts[store] = len(data)
+    finally:
+        backend.close()
+
+    return counts
+
+if __name__ == '__main__':
+    # Usage: python -m utils.storage migrate [sqlite_path]
+    if len(sys.argv) < 2 or sys.argv[1] != 'migrate':
+        print("Usage: python -m utils.storage migrate [sqlite_path]")
+        sys.exit(1)
+
+    path = sys.argv[2] if len(sys.argv) > 2 else None
+    for store, count in migrate_json_to_sqlite(path).items():
+        print(f"Migrated {count} {store} records")
@@ -0,0 +1,50 @@
+import gzip
+import json
+import os
+import re
+from itertools import islice
+from config.settings import MODMAIL_CONFIG
+from utils.helpers import json_default
+
+# Ticket IDs are "<guild>_<user>_<timestamp>"; anything else never names a file
+TICKET_ID_PATTERN = re.compile(r'^[0-9_.]+$')
+
+class TranscriptStore:
+    """Closed modmail conversations, one gzip-compressed JSON-lines file per ticket
+
+    Messages are written once when a ticket is archived and read back a
+    page at a time by decompressing only as far as the requested page, so
+    old conversations never have to be held in memory.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or MODMAIL_CONFIG['transcript_dir']
+
+    def path(self, ticket_id):
+        if not TICKET_ID_PATTERN.match(ticket_id):
+            raise ValueError(f"Invalid ticket ID: {ticket_id!r}")
+        return os.path.join(self.directory, f"{ticket_id}.jsonl.gz")
+
+    def write(self, ticket_id, messages):
+        """Atomically store a ticket's messages, returning the compressed size"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(ticket_id)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                for message in messages:
+                    f.write(json.dumps(message, default=json_default).encode() + b'\n')
+            raw.flush()
+            os.fsync(raw.fileno())
+            size = raw.tell()
+        os.replace(temp_path, path)
+        return size
+
+    def read(self, ticket_id, start=0, count=None):
+        """Read count messages of a transcript from position start"""
+        path = self.path(ticket_id)
+        if not os.path.exists(path):
+            return []
+        stop = None if count is None else start + count
+        with gzip.open(path, 'rb') as f:
+            return [json.loads(line) for line in islice(f, start, stop)]
@@ -0,0 +1,63 @@
+import aiohttp
+from config.settings import HTTP_CONFIG
+
+class DownloadError(Exception):
+    """A download failed or returned an error status"""
+
+class DownloadTooLarge(DownloadError):
+    """A download went over its size cap"""
+
+class WebClient:
+    """Bot-wide pooled HTTP session for downloading files
+
+    One connection pool and DNS cache is shared by every cog instead of
+    each request opening its own session. The session must be started
+    from inside the running event loop.
+    """
+
+    def __init__(self):
+        self.session = None
+
+    async def start(self):
+        """Open the shared session"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(
+                    total=HTTP_CONFIG['total_timeout'],
+                    sock_connect=HTTP_CONFIG['connect_timeout'],
+                    sock_read=HTTP_CONFIG['read_timeout']
+                ),
+                connector=aiohttp.TCPConnector(
+                    limit=HTTP_CONFIG['pool_size'],
+                    ttl_dns_cache=HTTP_CONFIG['dns_cache_ttl']
+                )
+            )
+
+    async def fetch(self, url, max_size):
+        """Download url, aborting as soon as the body passes max_size bytes"""
+        await self.start()
+        try:
+            async with self.session.get(url) as resp:
+                if resp.status != 200:
+                    raise DownloadError(f"HTTP {resp.status}")
+
+                # Refuse early when the server admits the body is too big
+                if resp.content_length is not None and resp.content_length > max_size:
+                    raise DownloadTooLarge(f"{resp.content_length} bytes")
+
+                chunks = []
+                size = 0
+                async for chunk in resp.content.iter_chunked(16384):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise DownloadTooLarge(f"over {max_size} bytes")
+                    chunks.append(chunk)
+                return b''.join(chunks)
+        except (aiohttp.ClientError, TimeoutError) as e:
+            raise DownloadError(str(e) or type(e).__name__) from e
+
+    async def close(self):
+        """Close the shared session"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None